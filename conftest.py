@@ -0,0 +1,19 @@
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def isolated_files():
+    from core.test_runner import isolated_files
+
+    with isolated_files() as directory:
+        yield directory
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # База откатывается после каждого теста, а сброс кэшей по сигналам
+    # ждёт фиксации транзакции, поэтому кэш тоже не переживает тест.
+    from django.core.cache import cache
+
+    cache.clear()
+    yield
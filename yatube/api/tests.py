@@ -0,0 +1,133 @@
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {number}',
+                group=cls.group if number % 2 else None
+            )
+            for number in range(5)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.user, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def get(self, name, *args, client=None, **params):
+        return (client or self.client).get(
+            reverse(f'api:{name}', args=args), params
+        )
+
+    def test_post_list_sparse_fields(self):
+        with self.assertNumQueries(1):
+            response = self.get('post_list', fields='id,author')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0], {
+            'id': self.posts[-1].pk, 'author': 'author'
+        })
+
+    def test_post_list_cursor_pagination(self):
+        response = self.get('post_list', limit=2, fields='id')
+        ids = []
+        while True:
+            data = response.json()
+            ids += [row['id'] for row in data['results']]
+            if data['next'] is None:
+                break
+            response = self.client.get(data['next'])
+        self.assertEqual(ids, [post.pk for post in reversed(self.posts)])
+        self.assertIsNotNone(data['previous'])
+        previous = self.client.get(data['previous']).json()
+        self.assertEqual(
+            [row['id'] for row in previous['results']],
+            [self.posts[2].pk, self.posts[1].pk]
+        )
+
+    def test_post_list_filters(self):
+        data = self.get('post_list', group='group', fields='id').json()
+        self.assertEqual(
+            [row['id'] for row in data['results']],
+            [self.posts[3].pk, self.posts[1].pk]
+        )
+        data = self.get('post_list', author='user').json()
+        self.assertEqual(data['results'], [])
+
+    def test_post_detail(self):
+        data = self.get('post_detail', self.posts[1].pk).json()
+        self.assertEqual(data['text'], 'Пост 1')
+        self.assertEqual(data['group'], 'group')
+        self.assertIsNone(data['image'])
+        response = self.get('post_detail', 0)
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(
+            self.get('post_list', fields='id,password').status_code, 400
+        )
+        self.assertEqual(self.get('post_list', limit='x').status_code, 400)
+        self.assertEqual(self.get('post_list', limit=1000).status_code, 400)
+        response = self.client.post(reverse('api:post_list'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_invalid_cursor(self):
+        client = Client()
+        client.force_login(self.user)
+        endpoints = (
+            ('post_list', ()),
+            ('comment_list', (self.posts[0].pk,)),
+            ('group_list', ()),
+            ('follow_list', ()),
+        )
+        cursors = ['!!'] + [
+            base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+            for value in (
+                ['next', ['x']],
+                ['next', ['garbage', 1]],
+                ['next', [[1], {}]],
+                ['prev', ['2020-01-01T00:00:00', 'x']],
+            )
+        ]
+        for name, args in endpoints:
+            for cursor in cursors:
+                with self.subTest(endpoint=name, cursor=cursor):
+                    response = self.get(
+                        name, *args, client=client, cursor=cursor
+                    )
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('detail', response.json())
+
+    def test_comments_and_groups(self):
+        data = self.get('comment_list', self.posts[0].pk).json()
+        self.assertEqual(data['results'][0]['text'], 'Комментарий')
+        self.assertEqual(data['results'][0]['author'], 'user')
+        data = self.get('group_detail', 'group', fields='title').json()
+        self.assertEqual(data, {'title': 'Группа'})
+        data = self.get('group_list').json()
+        self.assertEqual(data['results'][0]['slug'], 'group')
+
+    def test_follows_require_login(self):
+        self.assertEqual(self.get('follow_list').status_code, 401)
+        client = Client()
+        client.force_login(self.user)
+        data = self.get('follow_list', client=client).json()
+        self.assertEqual(data['results'], [{
+            'id': Follow.objects.get().pk, 'user': 'user', 'author': 'author'
+        }])
@@ -0,0 +1,206 @@
+"""JSON API только для чтения: посты, группы, комментарии и подписки.
+
+Строки читаются через .values() по колонкам, которые клиент попросил
+в fields=, без создания моделей и рендеринга шаблонов. Списки
+постранично отдаются CursorPaginator: в ответе есть ссылки next и
+previous с курсором.
+"""
+from functools import wraps
+from http import HTTPStatus
+
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from core.paginator import CursorPaginator, InvalidCursor
+from core.query_budget import query_budget
+from posts.models import Comment, Follow, Group, Post
+
+PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+# Поле ответа → поле для .values().
+POST_FIELDS = {
+    "id": "id",
+    "text": "text",
+    "pub_date": "pub_date",
+    "author": "author__username",
+    "group": "group__slug",
+    "image": "image",
+    "comments_count": "comments_count",
+}
+GROUP_FIELDS = {
+    "id": "id",
+    "slug": "slug",
+    "title": "title",
+    "description": "description",
+    "posts_count": "posts_count",
+}
+COMMENT_FIELDS = {
+    "id": "id",
+    "post": "post_id",
+    "author": "author__username",
+    "text": "text",
+    "pub_date": "pub_date",
+}
+FOLLOW_FIELDS = {
+    "id": "id",
+    "user": "user__username",
+    "author": "author__username",
+}
+
+
+class ApiError(Exception):
+
+    def __init__(self, message, status=HTTPStatus.BAD_REQUEST):
+        super().__init__(message)
+        self.status = status
+
+
+def api_view(view_func):
+    """Только GET; ApiError превращается в JSON-ответ с ошибкой."""
+    @wraps(view_func)
+    @require_GET
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view_func(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({"detail": str(error)}, status=error.status)
+    return wrapper
+
+
+def requested_fields(request, available):
+    """Поля из ?fields=a,b; без параметра — все."""
+    value = request.GET.get("fields")
+    if not value:
+        return list(available)
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown or not names:
+        raise ApiError(
+            f"Неизвестные поля: {', '.join(unknown)}. "
+            f"Доступны: {', '.join(available)}"
+        )
+    return names
+
+
+def page_size(request):
+    value = request.GET.get("limit")
+    if not value:
+        return PAGE_SIZE
+    try:
+        size = int(value)
+    except ValueError:
+        raise ApiError("limit должен быть числом")
+    if not 1 <= size <= MAX_PAGE_SIZE:
+        raise ApiError(f"limit должен быть от 1 до {MAX_PAGE_SIZE}")
+    return size
+
+
+def project(queryset, available, names, extra=()):
+    """queryset.values() только с нужными колонками."""
+    columns = {available[name] for name in names}
+    columns.update(extra)
+    return queryset.values(*sorted(columns))
+
+
+def serialize(row, available, names):
+    data = {name: row[available[name]] for name in names}
+    if "image" in data:
+        data["image"] = image_url(data["image"])
+    return data
+
+
+def image_url(name):
+    if not name:
+        return None
+    return Post._meta.get_field("image").storage.url(name)
+
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params["cursor"] = cursor
+    return f"{request.path}?{params.urlencode()}"
+
+
+def paginated(request, queryset, available, ordering):
+    names = requested_fields(request, available)
+    paginator = CursorPaginator(
+        project(
+            queryset, available, names,
+            extra=(key.lstrip("-") for key in ordering)
+        ),
+        page_size(request),
+        ordering
+    )
+    cursor = request.GET.get("cursor")
+    if cursor:
+        # В HTML-лентах неверный курсор ведёт на первую страницу, клиенту
+        # API лучше узнать об ошибке.
+        try:
+            paginator.decode_cursor(cursor)
+        except InvalidCursor:
+            raise ApiError("Неверный курсор")
+    page = paginator.get_page(cursor)
+    return JsonResponse({
+        "results": [serialize(row, available, names) for row in page],
+        "next": page_url(request, page.next_cursor),
+        "previous": page_url(request, page.previous_cursor),
+    })
+
+
+def detail(request, queryset, available, **lookup):
+    names = requested_fields(request, available)
+    row = project(queryset.filter(**lookup), available, names).first()
+    if row is None:
+        raise ApiError("Не найдено", HTTPStatus.NOT_FOUND)
+    return JsonResponse(serialize(row, available, names))
+
+
+@query_budget(1)
+@api_view
+def post_list(request):
+    """Посты от новых к старым; фильтры ?group=<slug> и ?author=<username>.
+    """
+    posts = Post.objects.all()
+    if request.GET.get("group"):
+        posts = posts.filter(group__slug=request.GET["group"])
+    if request.GET.get("author"):
+        posts = posts.filter(author__username=request.GET["author"])
+    return paginated(request, posts, POST_FIELDS, ("-pub_date", "-id"))
+
+
+@query_budget(1)
+@api_view
+def post_detail(request, post_id):
+    return detail(request, Post.objects.all(), POST_FIELDS, pk=post_id)
+
+
+@query_budget(1)
+@api_view
+def comment_list(request, post_id):
+    """Комментарии поста от старых к новым."""
+    comments = Comment.objects.filter(post_id=post_id)
+    return paginated(request, comments, COMMENT_FIELDS, ("pub_date", "id"))
+
+
+@query_budget(1)
+@api_view
+def group_list(request):
+    return paginated(request, Group.objects.all(), GROUP_FIELDS, ("id",))
+
+
+@query_budget(1)
+@api_view
+def group_detail(request, slug):
+    return detail(request, Group.objects.all(), GROUP_FIELDS, slug=slug)
+
+
+@query_budget(3)
+@api_view
+def follow_list(request):
+    """Подписки текущего пользователя, новые первыми."""
+    if not request.user.is_authenticated:
+        raise ApiError("Нужна авторизация", HTTPStatus.UNAUTHORIZED)
+    follows = Follow.objects.filter(user=request.user)
+    return paginated(request, follows, FOLLOW_FIELDS, ("-id",))
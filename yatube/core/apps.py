@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = "core"
+
+    def ready(self):
+        # Подключает apply_pragmas и querylog.install к connection_created.
+        from . import querylog, sqlite  # noqa: F401
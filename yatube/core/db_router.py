@@ -0,0 +1,92 @@
+"""Чтение с реплик для представлений, которые только читают.
+
+Представление, помеченное @use_replica, читает с одной из реплик
+DATABASE_REPLICAS; всё остальное, включая любую запись, идёт в default.
+Реплика может отставать, поэтому пользователь, который только что
+что-то записал, ещё REPLICA_STICKY_SECONDS секунд читает с основной
+базы: ReplicaMiddleware ставит ему cookie, пока оно живо, реплики для
+него не используются.
+
+Ответы, которые попадут в общий кэш, читаются с основной базы (primary()):
+иначе после сброса кэша отстающая реплика успеет положить в него старую
+страницу под новыми версиями ключей, и та проживёт весь срок кэша.
+"""
+import random
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PRIMARY_COOKIE = 'use_primary'
+
+_state = threading.local()
+
+
+def reset(sticky=False):
+    """Начинает новый запрос: sticky — читать только с основной базы."""
+    _state.replica = False
+    _state.sticky = sticky
+    _state.wrote = False
+
+
+def wrote():
+    """Была ли запись в основную базу с начала запроса."""
+    return getattr(_state, 'wrote', False)
+
+
+def use_replica(view_func):
+    """Отправляет чтение представления на реплику."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        previous = getattr(_state, 'replica', False)
+        _state.replica = True
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _state.replica = previous
+    return wrapper
+
+
+def on_replica():
+    """Идёт ли сейчас чтение с реплики."""
+    return bool(
+        settings.DATABASE_REPLICAS and getattr(_state, 'replica', False)
+        and not getattr(_state, 'sticky', False) and not wrote()
+    )
+
+
+@contextmanager
+def primary():
+    """Чтение внутри блока — с основной базы даже под @use_replica."""
+    previous = getattr(_state, 'replica', False)
+    _state.replica = False
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if not on_replica():
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Реплики получают схему вместе с данными основной базы.
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
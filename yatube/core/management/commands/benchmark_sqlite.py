@@ -0,0 +1,183 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.sqlite import backoff, is_locked
+
+POSTS = 1000
+# Доля записей среди операций: комментарий и счётчик поста.
+WRITE_SHARE = 0.2
+SCHEMA = '''
+CREATE TABLE post (id INTEGER PRIMARY KEY, comments_count INTEGER);
+CREATE TABLE comment (
+    id INTEGER PRIMARY KEY, post_id INTEGER, text TEXT, pub_date REAL
+);
+CREATE INDEX comment_post_idx ON comment (post_id, pub_date);
+'''
+
+
+class Profile:
+    """Как соединения открываются и что делать с «database is locked»."""
+
+    def __init__(self, name, persistent, pragmas, retries):
+        self.name = name
+        self.persistent = persistent
+        self.pragmas = pragmas
+        self.retries = retries
+
+    def connect(self, path):
+        connection = sqlite3.connect(
+            path, timeout=5, isolation_level=None, check_same_thread=False
+        )
+        for name, value in self.pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+
+PROFILES = {
+    # Настройки Django по умолчанию: соединение на запрос, журнал DELETE.
+    'default': Profile('default', False, {}, 1),
+    'tuned': Profile(
+        'tuned', True, settings.SQLITE_PRAGMAS, settings.SQLITE_LOCK_RETRIES
+    ),
+}
+
+
+def read(connection):
+    connection.execute(
+        'SELECT id, text FROM comment WHERE post_id = ? '
+        'ORDER BY pub_date DESC LIMIT 10',
+        (random.randint(1, POSTS),)
+    ).fetchall()
+
+
+def write(connection):
+    post_id = random.randint(1, POSTS)
+    connection.execute('BEGIN')
+    try:
+        connection.execute(
+            'SELECT comments_count FROM post WHERE id = ?', (post_id,)
+        ).fetchone()
+        connection.execute(
+            'INSERT INTO comment (post_id, text, pub_date) VALUES (?, ?, ?)',
+            (post_id, 'Комментарий', time.time())
+        )
+        connection.execute(
+            'UPDATE post SET comments_count = comments_count + 1 '
+            'WHERE id = ?', (post_id,)
+        )
+        connection.execute('COMMIT')
+    except sqlite3.OperationalError:
+        connection.execute('ROLLBACK')
+        raise
+
+
+class Run:
+
+    def __init__(self, profile, path, threads, seconds):
+        self.profile = profile
+        self.path = path
+        self.threads = threads
+        self.seconds = seconds
+        self.lock = threading.Lock()
+        self.reads = self.writes = self.retries = self.errors = 0
+
+    def operation(self, connection):
+        is_write = random.random() < WRITE_SHARE
+        for attempt in range(1, self.profile.retries + 1):
+            try:
+                if is_write:
+                    write(connection)
+                else:
+                    read(connection)
+                return is_write, attempt - 1, False
+            except sqlite3.OperationalError as error:
+                if not is_locked(error) or attempt == self.profile.retries:
+                    return is_write, attempt - 1, True
+                time.sleep(backoff(attempt, settings.SQLITE_LOCK_RETRY_DELAY))
+
+    def worker(self, deadline):
+        connection = None
+        while time.monotonic() < deadline:
+            if connection is None:
+                connection = self.profile.connect(self.path)
+            is_write, retries, failed = self.operation(connection)
+            if not self.profile.persistent:
+                connection.close()
+                connection = None
+            with self.lock:
+                self.retries += retries
+                if failed:
+                    self.errors += 1
+                elif is_write:
+                    self.writes += 1
+                else:
+                    self.reads += 1
+        if connection is not None:
+            connection.close()
+
+    def start(self):
+        deadline = time.monotonic() + self.seconds
+        workers = [
+            threading.Thread(target=self.worker, args=(deadline,))
+            for _ in range(self.threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return self
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность SQLite с настройками Django по '
+        'умолчанию и с SQLITE_PRAGMAS, постоянными соединениями и повторами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument(
+            '--seconds', type=float, default=10,
+            help='Длительность прогона каждого профиля'
+        )
+        parser.add_argument(
+            '--profile', choices=tuple(PROFILES), action='append',
+            help='Профиль для прогона; по умолчанию — все'
+        )
+
+    def handle(self, *args, **options):
+        names = options['profile'] or list(PROFILES)
+        self.stdout.write(
+            f'{options["threads"]} потоков, {WRITE_SHARE:.0%} записей, '
+            f'{options["seconds"]:g} с на профиль'
+        )
+        for name in names:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'benchmark.sqlite3')
+                self.prepare(path)
+                run = Run(
+                    PROFILES[name], path, options['threads'],
+                    options['seconds']
+                ).start()
+            total = run.reads + run.writes
+            self.stdout.write(
+                f'{name:>8}: {total / run.seconds:8.0f} оп/с, '
+                f'записей {run.writes / run.seconds:6.0f}/с, '
+                f'повторов {run.retries}, ошибок {run.errors}'
+            )
+
+    def prepare(self, path):
+        connection = sqlite3.connect(path, isolation_level=None)
+        connection.executescript(SCHEMA)
+        connection.executemany(
+            'INSERT INTO post (id, comments_count) VALUES (?, 0)',
+            ((post_id,) for post_id in range(1, POSTS + 1))
+        )
+        connection.close()
@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.querylog import read_log
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводка журнала медленных запросов: самые дорогие по суммарному '
+        'времени запросы с их представлениями, местами вызова и планами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log', default=settings.SLOW_QUERY_LOG,
+            help='Журнал медленных запросов (JSON Lines)'
+        )
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument(
+            '--view', help='Только запросы этого представления'
+        )
+
+    def handle(self, *args, **options):
+        groups = {}
+        try:
+            for entry in read_log(options['log']):
+                if options['view'] and entry.get('view') != options['view']:
+                    continue
+                group = groups.setdefault(entry['fingerprint'], {
+                    'query': entry['query'], 'count': 0, 'total': 0.0,
+                    'max': 0.0, 'views': set(), 'sites': set(), 'plan': [],
+                })
+                group['count'] += 1
+                group['total'] += entry['ms']
+                if entry['ms'] >= group['max']:
+                    group['max'] = entry['ms']
+                    group['plan'] = entry.get('plan') or []
+                group['views'].add(entry.get('view') or '-')
+                group['sites'].add(entry.get('site') or '-')
+        except FileNotFoundError:
+            raise CommandError(f'Нет журнала {options["log"]}')
+        if not groups:
+            self.stdout.write('Медленных запросов нет')
+            return
+        ranked = sorted(
+            groups.items(), key=lambda item: item[1]['total'], reverse=True
+        )[:options['top']]
+        self.stdout.write(
+            f'{"#":>3}{"всего_ms":>12}{"раз":>7}{"сред_ms":>10}'
+            f'{"макс_ms":>10}  отпечаток'
+        )
+        for number, (key, group) in enumerate(ranked, 1):
+            self.stdout.write(
+                f'{number:>3}{group["total"]:>12.1f}{group["count"]:>7}'
+                f'{group["total"] / group["count"]:>10.1f}'
+                f'{group["max"]:>10.1f}  {key}'
+            )
+        for number, (key, group) in enumerate(ranked, 1):
+            self.stdout.write(f'\n#{number} {key}')
+            self.stdout.write(f'  {group["query"]}')
+            self.stdout.write(
+                '  представления: ' + ', '.join(sorted(group['views']))
+            )
+            self.stdout.write(
+                '  места вызова: ' + ', '.join(sorted(group['sites']))
+            )
+            for line in group['plan']:
+                self.stdout.write(f'  план: {line}')
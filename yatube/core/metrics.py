@@ -0,0 +1,289 @@
+"""Замеры запросов для заголовка Server-Timing и страницы /metrics.
+
+TimingMiddleware засекает время всего запроса, время и число SQL-запросов
+(execute_wrapper на всех соединениях), время рендеринга шаблонов
+(бэкенд TimedTemplates) и попадание в кэш страниц (cache_anonymous).
+Итог уходит клиенту в Server-Timing и копится в гистограммах по имени
+URL-шаблона.
+
+Каждый процесс держит свои гистограммы в памяти и не чаще раза в
+METRICS_FLUSH_INTERVAL секунд сбрасывает их в отдельный файл каталога
+METRICS_DIR. /metrics складывает файлы всех процессов, поэтому при
+нескольких воркерах сервера видна сумма, а не данные одного случайного
+процесса. Файлы завершившихся процессов остаются: счётчики Prometheus
+только растут. Каталог очищают перед перезапуском сервера; тесты пишут
+в свой временный каталог (core.test_runner).
+"""
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+from django.template.backends.django import Template as DjangoTemplate
+
+TIME_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+HISTOGRAMS = {
+    'yatube_request_duration_seconds': (
+        'Время обработки запроса', TIME_BUCKETS
+    ),
+    'yatube_sql_duration_seconds': (
+        'Суммарное время SQL-запросов за запрос', TIME_BUCKETS
+    ),
+    'yatube_sql_queries': ('Число SQL-запросов за запрос', COUNT_BUCKETS),
+    'yatube_template_duration_seconds': (
+        'Время рендеринга шаблонов за запрос', TIME_BUCKETS
+    ),
+}
+COUNTERS = {
+    'yatube_requests_total': 'Ответы по представлениям и кодам',
+    'yatube_response_cache_total': 'Попадания и промахи кэша страниц',
+}
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Метка запросов, которые не сопоставились ни с одним URL-шаблоном.
+UNRESOLVED = 'unresolved'
+
+_state = threading.local()
+
+
+class Timing:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.sql = 0.0
+        self.queries = 0
+        self.template = 0.0
+        self.cache = None
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += time.perf_counter() - started
+            self.queries += 1
+
+    def stop(self):
+        self.total = time.perf_counter() - self.started
+
+    def header(self):
+        parts = [
+            f'app;dur={self.total * 1000:.1f}',
+            f'db;dur={self.sql * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template * 1000:.1f}',
+        ]
+        if self.cache is not None:
+            parts.append(f'cache;desc={self.cache}')
+        return ', '.join(parts)
+
+
+def start():
+    _state.timing = Timing()
+    return _state.timing
+
+
+def current():
+    return getattr(_state, 'timing', None)
+
+
+def finish():
+    timing = current()
+    _state.timing = None
+    if timing is not None:
+        timing.stop()
+    return timing
+
+
+def record_cache(hit):
+    """Отмечает попадание или промах кэша страниц в текущем запросе."""
+    timing = current()
+    if timing is not None:
+        timing.cache = 'hit' if hit else 'miss'
+
+
+class TimedTemplate(DjangoTemplate):
+
+    def render(self, context=None, request=None):
+        timing = current()
+        if timing is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timing.template += time.perf_counter() - started
+
+
+class TimedTemplates(DjangoTemplates):
+    """DjangoTemplates, которые засчитывают рендеринг текущему запросу.
+
+    {% include %} и {% extends %} не проходят через бэкенд, поэтому
+    вложенные шаблоны не считаются дважды.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+class Registry:
+    """Гистограммы и счётчики процесса, сбрасываемые в METRICS_DIR."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+        self.pid = None
+        self.filename = None
+        self.flushed = 0.0
+
+    def _own_file(self):
+        # После fork у дочернего процесса свой файл и свои значения.
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.filename = f'{self.pid}-{uuid.uuid4().hex}.json'
+            self.values = {}
+        return self.filename
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        with self.lock:
+            self._own_file()
+            key = (name, tuple(sorted(labels.items())))
+            counts = self.values.setdefault(key, [0] * (len(buckets) + 3))
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[len(buckets)] += 1
+            # Последние два значения — сумма и число наблюдений.
+            counts[-2] += value
+            counts[-1] += 1
+
+    def inc(self, name, labels, amount=1):
+        with self.lock:
+            self._own_file()
+            key = (name, tuple(sorted(labels.items())))
+            self.values.setdefault(key, [0])[0] += amount
+
+    def reset(self):
+        with self.lock:
+            self.values = {}
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.flushed < settings.METRICS_FLUSH_INTERVAL:
+            return
+        with self.lock:
+            filename = self._own_file()
+            data = [
+                [name, list(labels), counts]
+                for (name, labels), counts in self.values.items()
+            ]
+            self.flushed = now
+        if not data:
+            return
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = os.path.join(settings.METRICS_DIR, filename)
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as output:
+            json.dump(data, output)
+        os.replace(temporary, path)
+
+    def collect(self):
+        """Сумма значений всех процессов: {(имя, метки): значения}."""
+        self.flush(force=True)
+        total = {}
+        try:
+            names = os.listdir(settings.METRICS_DIR)
+        except FileNotFoundError:
+            names = []
+        for filename in names:
+            if not filename.endswith('.json'):
+                continue
+            try:
+                path = os.path.join(settings.METRICS_DIR, filename)
+                with open(path, encoding='utf-8') as source:
+                    data = json.load(source)
+            except (OSError, ValueError):
+                continue
+            for name, labels, counts in data:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                if key not in total:
+                    total[key] = list(counts)
+                else:
+                    total[key] = [a + b for a, b in zip(total[key], counts)]
+        return total
+
+
+registry = Registry()
+atexit.register(registry.flush, force=True)
+
+
+def observe(view, status, timing):
+    labels = {'view': view}
+    registry.observe('yatube_request_duration_seconds', labels, timing.total)
+    registry.observe('yatube_sql_duration_seconds', labels, timing.sql)
+    registry.observe('yatube_sql_queries', labels, timing.queries)
+    registry.observe(
+        'yatube_template_duration_seconds', labels, timing.template
+    )
+    registry.inc(
+        'yatube_requests_total', {'view': view, 'status': str(status)}
+    )
+    if timing.cache is not None:
+        registry.inc(
+            'yatube_response_cache_total',
+            {'view': view, 'result': timing.cache}
+        )
+    registry.flush()
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def render():
+    """Текст /metrics в формате Prometheus."""
+    values = registry.collect()
+    lines = []
+    for name, (description, buckets) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} histogram')
+        for (metric, labels), counts in sorted(values.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{_labels(labels, [("le", bound)])} '
+                    f'{cumulative}'
+                )
+            lines.append(f'{name}_sum{_labels(labels)} {counts[-2]}')
+            lines.append(f'{name}_count{_labels(labels)} {counts[-1]}')
+    for name, description in COUNTERS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} counter')
+        for (metric, labels), counts in sorted(values.items()):
+            if metric == name:
+                lines.append(f'{name}{_labels(labels)} {counts[0]}')
+    return '\n'.join(lines) + '\n'
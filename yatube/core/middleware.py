@@ -0,0 +1,104 @@
+import sys
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import db_router, metrics, querylog
+from .query_budget import QueryBudget
+
+
+class QueryBudgetMiddleware:
+    """Считает запросы представлений с @query_budget.
+
+    QueryBudget открывается в process_view и закрывается, когда
+    get_response вернул ответ, — само представление, как обычно,
+    вызывает Django. Должен стоять последним, чтобы в бюджет не
+    попадали запросы других middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            budget = getattr(request, '_query_budget', None)
+            if budget is not None:
+                del request._query_budget
+                budget.__exit__(*sys.exc_info())
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        limit = getattr(view_func, 'query_budget', None)
+        if limit is not None:
+            request._query_budget = QueryBudget(
+                limit, label=request.resolver_match.view_name
+            ).__enter__()
+
+
+class ReplicaMiddleware:
+    """Держит пользователя на основной базе после записи.
+
+    Должен стоять до SessionMiddleware, чтобы запись сессии тоже
+    считалась записью.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db_router.reset(sticky=db_router.PRIMARY_COOKIE in request.COOKIES)
+        response = self.get_response(request)
+        if db_router.wrote():
+            response.set_cookie(
+                db_router.PRIMARY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True
+            )
+        db_router.reset()
+        return response
+
+
+class TimingMiddleware:
+    """Замеряет запрос для Server-Timing и /metrics.
+
+    Должен стоять первым, чтобы в общее время попали все остальные
+    middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = metrics.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timing.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.finish()
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else metrics.UNRESOLVED
+        metrics.observe(view, response.status_code, timing)
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = timing.header()
+        return response
+
+
+class QueryTagMiddleware:
+    """Запоминает представление для комментариев SQL (core.querylog)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            querylog.set_view(None)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        querylog.set_view(request.resolver_match.view_name)
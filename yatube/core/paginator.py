@@ -0,0 +1,185 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+NEXT = 'next'
+PREVIOUS = 'prev'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage(Sequence):
+    """Страница курсорной пагинации.
+
+    В отличие от django.core.paginator.Page не знает номера страницы и
+    общего числа объектов: вместо этого отдаёт курсоры соседних страниц.
+    """
+    cursor_based = True
+
+    def __init__(self, object_list, paginator, cursor, has_next,
+                 has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<CursorPage {self.cursor or "first"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def number(self):
+        """Идентификатор страницы (курсор), аналог Page.number."""
+        return self.cursor or ''
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1], NEXT)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.encode_cursor(self.object_list[0], PREVIOUS)
+
+
+class CursorPaginator:
+    """Keyset-пагинация по упорядоченному queryset.
+
+    Страница выбирается условием WHERE по значениям ключей сортировки
+    последнего показанного объекта, поэтому не нужны ни COUNT(*), ни
+    OFFSET, и глубокие страницы стоят столько же, сколько первая.
+    Ключи сортировки должны однозначно упорядочивать выборку, поэтому
+    последним ключом обычно идёт первичный ключ. Объекты могут быть как
+    моделями, так и словарями из .values().
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = tuple(key.lstrip('-') for key in self.ordering)
+
+    def _value(self, obj, field):
+        if isinstance(obj, dict):
+            return obj[field]
+        return getattr(obj, field)
+
+    def _field(self, name):
+        """Поле модели или аннотации, по которому идёт сортировка."""
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.object_list.model._meta.get_field(name)
+
+    def encode_cursor(self, obj, direction):
+        values = []
+        for field in self.fields:
+            value = self._value(obj, field)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            values.append(value)
+        payload = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded))
+        except (TypeError, ValueError, binascii.Error):
+            raise InvalidCursor(cursor)
+        if (direction not in (NEXT, PREVIOUS)
+                or not isinstance(values, list)
+                or len(values) != len(self.fields)):
+            raise InvalidCursor(cursor)
+        # Значения из курсора — ввод клиента: приводим их к типам полей
+        # сортировки, иначе неверное значение упадёт уже в запросе.
+        try:
+            values = [
+                self._field(field).to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor(cursor)
+        if any(value is None for value in values):
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def _seek(self, values, forward):
+        """Условие «строго после values» в порядке self.ordering."""
+        condition = Q()
+        for i, key in enumerate(self.ordering):
+            descending = key.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            step = Q(**{f'{self.fields[i]}__{lookup}': values[i]})
+            for field, value in zip(self.fields[:i], values[:i]):
+                step &= Q(**{field: value})
+            condition |= step
+        return condition
+
+    def _reversed_ordering(self):
+        return tuple(
+            key[1:] if key.startswith('-') else f'-{key}'
+            for key in self.ordering
+        )
+
+    def get_page(self, cursor=None):
+        """Возвращает страницу по курсору; некорректный курсор — первая."""
+        if cursor:
+            try:
+                direction, values = self.decode_cursor(cursor)
+            except InvalidCursor:
+                cursor = None
+        if not cursor:
+            rows = list(
+                self.object_list.order_by(*self.ordering)[:self.per_page + 1]
+            )
+            return CursorPage(
+                rows[:self.per_page], self, None,
+                has_next=len(rows) > self.per_page, has_previous=False
+            )
+        if direction == NEXT:
+            rows = list(
+                self.object_list.filter(self._seek(values, forward=True))
+                .order_by(*self.ordering)[:self.per_page + 1]
+            )
+            return CursorPage(
+                rows[:self.per_page], self, cursor,
+                has_next=len(rows) > self.per_page, has_previous=True
+            )
+        rows = list(
+            self.object_list.filter(self._seek(values, forward=False))
+            .order_by(*self._reversed_ordering())[:self.per_page + 1]
+        )
+        if not rows:
+            return self.get_page()
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return CursorPage(
+            rows, self, cursor, has_next=True, has_previous=has_previous
+        )
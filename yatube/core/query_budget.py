@@ -0,0 +1,93 @@
+"""Бюджет SQL-запросов для представлений.
+
+Представление объявляет бюджет декоратором @query_budget(N),
+QueryBudgetMiddleware считает его запросы в QueryBudget и при
+превышении пишет предупреждение в лог или, если включён
+QUERY_BUDGET_RAISE, бросает QueryBudgetExceeded — так N+1 в шаблонах
+ловится тестами, а не в продакшене.
+
+Считаются запросы ко всем базам: представления с @use_replica читают
+с реплик, и бюджет по одной default их бы не видел.
+"""
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryBudget:
+    """Считает запросы внутри блока и сверяет их число с лимитом.
+
+    Можно использовать и как контекстный менеджер, и как декоратор
+    произвольной функции.
+    """
+
+    def __init__(self, limit, label=None, using=None,
+                 raise_exception=None):
+        self.limit = limit
+        self.label = label
+        self.using = using
+        self.raise_exception = raise_exception
+        self.count = 0
+        self.queries = []
+
+    def _count(self, execute, sql, params, many, context):
+        self.count += 1
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.count = 0
+        self.queries = []
+        if self.using:
+            targets = [connections[self.using]]
+        else:
+            targets = connections.all()
+        self._wrappers = ExitStack()
+        for connection in targets:
+            self._wrappers.enter_context(
+                connection.execute_wrapper(self._count)
+            )
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._wrappers.__exit__(exc_type, exc_value, traceback)
+        if exc_type is None and self.count > self.limit:
+            self.exceeded()
+
+    def __call__(self, func):
+        def wrapper(*args, **kwargs):
+            with QueryBudget(self.limit, self.label or func.__qualname__,
+                             self.using, self.raise_exception):
+                return func(*args, **kwargs)
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def exceeded(self):
+        message = (
+            f'{self.label or "Блок"}: {self.count} SQL-запросов '
+            f'при бюджете {self.limit}'
+        )
+        raise_exception = self.raise_exception
+        if raise_exception is None:
+            raise_exception = getattr(settings, 'QUERY_BUDGET_RAISE', False)
+        if raise_exception:
+            raise QueryBudgetExceeded(
+                message + ':\n' + '\n'.join(self.queries)
+            )
+        logger.warning(message)
+
+
+def query_budget(limit):
+    """Объявляет бюджет запросов представления для QueryBudgetMiddleware."""
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+    return decorator
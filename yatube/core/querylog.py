@@ -0,0 +1,198 @@
+"""Метки SQL-запросов и журнал медленных запросов.
+
+tag_queries() ставится на каждое новое соединение и дописывает к каждому
+запросу комментарий с представлением и местом вызова в коде проекта:
+
+    SELECT ... /* view='posts:index',site='posts/views.py:52:index' */
+
+Представление запоминает QueryTagMiddleware, место вызова — первый кадр
+стека из BASE_DIR вне служебных модулей. Комментарий виден в логах и
+мониторинге самой базы.
+
+Запрос дольше SLOW_QUERY_MS миллисекунд дописывается строкой JSON в
+SLOW_QUERY_LOG вместе с планом (EXPLAIN через отдельный курсор, мимо
+execute_wrapper, чтобы не попасть в QueryBudget и метрики) и отпечатком:
+текстом запроса без литералов, по которому одинаковые запросы с разными
+параметрами складываются в manage.py slow_queries. Параметры запроса в
+журнал не пишутся: среди них ключи сессий, хеши паролей и тексты
+постов. Файл журнала доступен только владельцу.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, NotSupportedError
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Модули-обёртки, которые не считаются местом вызова.
+SKIP = ('core/querylog.py', 'core/metrics.py', 'core/middleware.py')
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+COMMENT = re.compile(r'/\*.*?\*/', re.S)
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER = re.compile(r'%s|\?')
+IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+SPACE = re.compile(r'\s+')
+
+_state = threading.local()
+_lock = threading.Lock()
+# Код → путь относительно BASE_DIR или None для чужого кода.
+_sites = {}
+
+
+def set_view(name):
+    _state.view = name
+
+
+def current_view():
+    return getattr(_state, 'view', None)
+
+
+def _project_path(code):
+    try:
+        return _sites[code]
+    except KeyError:
+        pass
+    if code.co_filename.startswith('<'):
+        _sites[code] = None
+        return None
+    path = os.path.abspath(code.co_filename)
+    base = os.path.join(os.path.abspath(settings.BASE_DIR), '')
+    relative = None
+    if path.startswith(base) and 'site-packages' not in path:
+        relative = path[len(base):].replace(os.sep, '/')
+        if relative.endswith(SKIP):
+            relative = None
+    _sites[code] = relative
+    return relative
+
+
+def call_site():
+    """«файл:строка:функция» ближайшего вызова из кода проекта."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        path = _project_path(frame.f_code)
+        if path is not None:
+            return f'{path}:{frame.f_lineno}:{frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+def _quote(value):
+    return "'" + value.replace('*/', '* /').replace("'", "\\'") + "'"
+
+
+def tag(sql, view, site):
+    parts = []
+    if view:
+        parts.append(f'view={_quote(view)}')
+    if site:
+        parts.append(f'site={_quote(site)}')
+    if not parts:
+        return sql
+    return f'{sql} /* {",".join(parts)} */'
+
+
+def normalize(sql):
+    """Текст запроса без комментариев и литералов."""
+    sql = COMMENT.sub('', sql)
+    sql = STRING.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    sql = PLACEHOLDER.sub('?', sql)
+    sql = IN_LIST.sub('(...)', sql)
+    return SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize(sql).encode()).hexdigest()[:16]
+
+
+def explain(connection, sql, params):
+    """План запроса строками; пустой список, если план не получить."""
+    if not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return []
+    try:
+        prefix = connection.ops.explain_query_prefix()
+    except NotSupportedError:
+        return []
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f'{prefix} {sql}', params)
+        return [str(row[-1]) for row in cursor.fetchall()]
+    except DatabaseError as error:
+        return [f'EXPLAIN не удался: {error}']
+    finally:
+        cursor.close()
+
+
+def record(connection, sql, params, many, milliseconds, view, site):
+    entry = {
+        'time': timezone.now().isoformat(),
+        'ms': round(milliseconds, 2),
+        'view': view,
+        'site': site,
+        'fingerprint': fingerprint(sql),
+        'query': normalize(sql),
+        'plan': [] if many else explain(connection, sql, params),
+        'pid': os.getpid(),
+    }
+    logger.info(
+        'Медленный запрос %.1f мс (%s, %s): %s',
+        milliseconds, view or '-', site or '-', entry['query']
+    )
+    line = json.dumps(entry, ensure_ascii=False) + '\n'
+    with _lock:
+        os.makedirs(
+            os.path.dirname(settings.SLOW_QUERY_LOG), mode=0o700,
+            exist_ok=True
+        )
+        descriptor = os.open(
+            settings.SLOW_QUERY_LOG, os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+            0o600
+        )
+        with open(descriptor, 'a', encoding='utf-8') as log:
+            log.write(line)
+
+
+def tag_queries(execute, sql, params, many, context):
+    view, site = current_view(), call_site()
+    started = time.perf_counter()
+    try:
+        return execute(tag(sql, view, site), params, many, context)
+    finally:
+        milliseconds = (time.perf_counter() - started) * 1000
+        if milliseconds >= settings.SLOW_QUERY_MS:
+            try:
+                record(
+                    context['connection'], sql, params, many,
+                    milliseconds, view, site
+                )
+            except Exception:
+                logger.exception('Не удалось записать медленный запрос')
+
+
+@receiver(connection_created)
+def install(sender, connection, **kwargs):
+    if tag_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, tag_queries)
+
+
+def read_log(path):
+    """Записи журнала; повреждённые строки пропускаются."""
+    with open(path, encoding='utf-8') as source:
+        for line in source:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
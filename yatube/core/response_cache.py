@@ -0,0 +1,130 @@
+"""Кэш целых страниц для анонимных посетителей.
+
+Представление помечает ответ суррогатными ключами (post:ID, group:SLUG,
+author:USERNAME) через add_surrogate_keys(); они же уходят в заголовке
+Surrogate-Key для CDN. У каждого ключа в кэше хранится версия, а
+закэшированный ответ запоминает версии своих ключей. purge() заменяет
+версии новыми, и все ответы с этими ключами перестают считаться актуальными —
+без обхода и удаления самих записей.
+
+Ключи ответа известны только после рендеринга, а purge() между чтением
+данных и чтением версий оставил бы в кэше старую страницу под новыми
+версиями. Поэтому purge() сначала меняет общую версию PURGES, и
+ответ не кэшируется, если она изменилась за время рендеринга.
+"""
+import hashlib
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from . import db_router, metrics
+
+SURROGATE_HEADER = 'Surrogate-Key'
+# Ключ, которым помечается любой закэшированный ответ.
+ALL = 'all'
+# Версия, которую меняет каждый purge().
+PURGES = 'purges'
+
+
+def _page_key(request):
+    url = request.build_absolute_uri()
+    return 'page:' + hashlib.md5(url.encode()).hexdigest()
+
+
+def _tag_key(tag):
+    # В ключах memcached нельзя пробелы и не-ASCII, а слаги бывают любыми.
+    return 'surrogate:' + hashlib.md5(tag.encode()).hexdigest()
+
+
+def _new_version():
+    # Уникальное значение вместо cache.incr: в общем файловом кэше incr —
+    # это get и set, и одновременные сбросы теряли бы друг друга. Версии
+    # только сравниваются, поэтому вытесненный ключ лишь даёт промахи.
+    return uuid.uuid4().hex
+
+
+def _versions(tags):
+    keys = {_tag_key(tag): tag for tag in tags}
+    found = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def versions(*tags):
+    """Текущие версии ключей tags; каждый purge() их меняет."""
+    return _versions(tags)
+
+
+def add_surrogate_keys(response, *tags):
+    keys = response.get(SURROGATE_HEADER, '').split()
+    keys.extend(tag for tag in tags if tag not in keys)
+    response[SURROGATE_HEADER] = ' '.join(keys)
+    return response
+
+
+def purge(*tags):
+    """Инвалидирует все закэшированные ответы с любым из ключей tags."""
+    for tag in (PURGES, *set(tags)):
+        cache.set(_tag_key(tag), _new_version(), timeout=None)
+
+
+def _cacheable(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_USED')
+        and 'private' not in response.get('Cache-Control', '')
+    )
+
+
+def cache_anonymous(view_func):
+    """Отдаёт анонимным GET/HEAD-запросам страницу из кэша.
+
+    При попадании представление не вызывается вовсе, а по ETag и
+    Last-Modified сохранённого ответа можно сразу ответить 304.
+    Время жизни записи — ANONYMOUS_CACHE_TIMEOUT, актуальность
+    обеспечивает purge(). Промах читает с основной базы, а не с реплики.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if (request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated):
+            return view_func(request, *args, **kwargs)
+        key = _page_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            response, versions = entry
+            if _versions(versions) == versions:
+                metrics.record_cache(hit=True)
+                response['X-Cache'] = 'HIT'
+                return get_conditional_response(
+                    request,
+                    etag=response.get('ETag'),
+                    last_modified=parse_http_date_safe(
+                        response.get('Last-Modified')
+                    ),
+                    response=response
+                )
+        metrics.record_cache(hit=False)
+        purges = _versions([PURGES])
+        with db_router.primary():
+            response = view_func(request, *args, **kwargs)
+        if _cacheable(request, response):
+            add_surrogate_keys(response, ALL)
+            versions = _versions(response[SURROGATE_HEADER].split())
+            if _versions([PURGES]) == purges:
+                cache.set(
+                    key, (response, versions),
+                    settings.ANONYMOUS_CACHE_TIMEOUT
+                )
+            response['X-Cache'] = 'MISS'
+        return response
+    return wrapper
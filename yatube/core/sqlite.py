@@ -0,0 +1,77 @@
+"""Настройка SQLite под конкурентную запись.
+
+apply_pragmas() выполняет SQLITE_PRAGMAS на каждом новом соединении:
+WAL разрешает читать во время записи, synchronous=NORMAL в режиме WAL
+не теряет согласованность, busy_timeout заставляет ждать чужую запись
+вместо мгновенной ошибки. Соединения живут CONN_MAX_AGE секунд, так что
+прагмы выполняются редко.
+
+busy_timeout не помогает, когда транзакция начала читать, а писатель
+тем временем изменил базу: SQLite сразу отвечает «database is locked».
+Такую транзакцию можно только повторить целиком — это делает
+retry_on_lock.
+"""
+import logging
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+
+def is_locked(error):
+    # «database is locked» и «database table is locked».
+    return 'is locked' in str(error)
+
+
+def backoff(attempt, delay):
+    """Пауза перед повтором номер attempt: удвоение со случайным разбросом,
+    чтобы столкнувшиеся писатели не повторяли одновременно."""
+    return delay * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    # Напрямую через sqlite3: прагмы не должны попадать в QueryBudget.
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def retry_on_lock(func=None, *, attempts=None, delay=None,
+                  using=DEFAULT_DB_ALIAS):
+    """Выполняет func в транзакции и повторяет её, если база занята.
+
+    Паузы между попытками растут вдвое от delay секунд (backoff()).
+    Внутри чужой транзакции повторять нечего: func просто вызывается.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if connections[using].in_atomic_block:
+                return func(*args, **kwargs)
+            tries = attempts or settings.SQLITE_LOCK_RETRIES
+            pause = delay or settings.SQLITE_LOCK_RETRY_DELAY
+            for attempt in range(1, tries + 1):
+                try:
+                    with transaction.atomic(using=using):
+                        return func(*args, **kwargs)
+                except OperationalError as error:
+                    if not is_locked(error) or attempt == tries:
+                        raise
+                    logger.warning(
+                        '%s: база занята, попытка %s из %s',
+                        func.__qualname__, attempt, tries
+                    )
+                    time.sleep(backoff(attempt, pause))
+        return wrapper
+    if func is not None:
+        return decorator(func)
+    return decorator
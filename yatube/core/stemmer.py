@@ -0,0 +1,132 @@
+"""Стеммер русского языка по алгоритму Snowball (Russian stemming).
+
+Используется полнотекстовым поиском: «посты», «поста» и «постами»
+сводятся к одной основе «пост». Латиница и цифры не изменяются.
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+
+
+def _by_length(*endings):
+    """Окончания от длинных к коротким: ищется самое длинное."""
+    return tuple(sorted(endings, key=len, reverse=True))
+
+
+PERFECTIVE_GERUND_1 = _by_length('вшись', 'вши', 'в')
+PERFECTIVE_GERUND_2 = _by_length(
+    'ившись', 'ывшись', 'ивши', 'ывши', 'ив', 'ыв'
+)
+REFLEXIVE = _by_length('ся', 'сь')
+ADJECTIVE = _by_length(
+    'ими', 'ыми', 'его', 'ого', 'ему', 'ому', 'ее', 'ие', 'ые', 'ое',
+    'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом', 'их', 'ых', 'ую',
+    'юю', 'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE_1 = _by_length('ем', 'нн', 'вш', 'ющ', 'щ')
+PARTICIPLE_2 = _by_length('ивш', 'ывш', 'ующ')
+VERB_1 = _by_length(
+    'ете', 'йте', 'ешь', 'нно', 'ла', 'на', 'ли', 'ем', 'ло', 'но', 'ет',
+    'ют', 'ны', 'ть', 'й', 'л', 'н',
+)
+VERB_2 = _by_length(
+    'ейте', 'уйте', 'ила', 'ыла', 'ена', 'ите', 'или', 'ыли', 'ило', 'ыло',
+    'ено', 'ует', 'уют', 'ены', 'ить', 'ыть', 'ишь', 'ей', 'уй', 'ил',
+    'ыл', 'им', 'ым', 'ен', 'ят', 'ит', 'ыт', 'ую', 'ю',
+)
+NOUN = _by_length(
+    'иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях', 'ев', 'ов', 'ие',
+    'ье', 'еи', 'ии', 'ей', 'ой', 'ий', 'ям', 'ем', 'ам', 'ом', 'ах',
+    'ях', 'ию', 'ью', 'ия', 'ья', 'а', 'е', 'и', 'й', 'о', 'у', 'ы', 'ь',
+    'ю', 'я',
+)
+SUPERLATIVE = _by_length('ейше', 'ейш')
+DERIVATIONAL = _by_length('ость', 'ост')
+
+CYRILLIC = re.compile('^[а-яё]+$')
+
+
+def _region(word, start):
+    """Начало области после первой пары «гласная + согласная»."""
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _strip(word, start, endings, after_a=False):
+    """Отрезает самое длинное окончание из endings, лежащее в word[start:].
+
+    after_a — окончание должно идти после «а» или «я» (сама буква
+    остаётся). Возвращает новое слово или None, если ничего не найдено.
+    """
+    for ending in endings:
+        if not word.endswith(ending):
+            continue
+        cut = len(word) - len(ending)
+        if cut < start:
+            continue
+        if after_a and (cut - 1 < start or word[cut - 1] not in 'ая'):
+            continue
+        return word[:cut]
+    return None
+
+
+def _strip_groups(word, start, group_1, group_2):
+    """Окончания двух групп Snowball: первая — только после «а»/«я»."""
+    candidates = [
+        stripped for stripped in (
+            _strip(word, start, group_1, after_a=True),
+            _strip(word, start, group_2),
+        ) if stripped is not None
+    ]
+    return min(candidates, key=len) if candidates else None
+
+
+def _step_1(word, rv):
+    """Деепричастия, иначе возвратность и прилагательные/глаголы/
+    существительные."""
+    stripped = _strip_groups(
+        word, rv, PERFECTIVE_GERUND_1, PERFECTIVE_GERUND_2
+    )
+    if stripped is not None:
+        return stripped
+    word = _strip(word, rv, REFLEXIVE) or word
+    stripped = _strip(word, rv, ADJECTIVE)
+    if stripped is not None:
+        return _strip_groups(
+            stripped, rv, PARTICIPLE_1, PARTICIPLE_2
+        ) or stripped
+    stripped = _strip_groups(word, rv, VERB_1, VERB_2)
+    if stripped is None:
+        stripped = _strip(word, rv, NOUN)
+    return stripped or word
+
+
+def _undouble_n(word, rv):
+    if word.endswith('нн') and len(word) - 1 >= rv:
+        return word[:-1]
+    return word
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC.match(word):
+        return word
+    rv = next(
+        (i + 1 for i, char in enumerate(word) if char in VOWELS), len(word)
+    )
+    r2 = _region(word, _region(word, 0))
+
+    word = _step_1(word, rv)
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    word = _strip(word, r2, DERIVATIONAL) or word
+    if word.endswith('нн') and len(word) - 1 >= rv:
+        return word[:-1]
+    stripped = _strip(word, rv, SUPERLATIVE)
+    if stripped is not None:
+        return _undouble_n(stripped, rv)
+    if word.endswith('ь') and len(word) - 1 >= rv:
+        word = word[:-1]
+    return word
@@ -0,0 +1,65 @@
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from . import metrics
+
+
+@contextmanager
+def isolated_files():
+    """Кэш, метрики и журнал медленных запросов — во временном каталоге.
+
+    Иначе файлы тестовых процессов попадут в каталоги сервера: /metrics
+    сложит их с настоящими значениями, а тесты будут читать и очищать
+    кэш запущенного сайта.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        with override_settings(
+            CACHES={'default': {
+                **settings.CACHES['default'],
+                'LOCATION': f'{directory}/cache',
+            }},
+            METRICS_DIR=f'{directory}/metrics',
+            SLOW_QUERY_LOG=f'{directory}/slow_queries.jsonl',
+        ):
+            try:
+                yield directory
+            finally:
+                # Иначе atexit сбросит значения в настоящий METRICS_DIR.
+                metrics.registry.reset()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+@contextmanager
+def commit_callbacks(using=DEFAULT_DB_ALIAS):
+    """Выполняет transaction.on_commit, отложенные внутри блока.
+
+    TestCase не фиксирует транзакцию теста, и без этого сброс кэшей по
+    сигналам в тестах не происходит.
+    """
+    connection = connections[using]
+    start = len(connection.run_on_commit)
+    yield
+    callbacks = connection.run_on_commit[start:]
+    del connection.run_on_commit[start:]
+    for savepoints, callback in callbacks:
+        callback()
+
+
+class TestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._isolated = isolated_files()
+        self._isolated.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._isolated.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
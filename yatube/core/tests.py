@@ -0,0 +1,371 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import warnings
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.http import HttpResponse
+from django.test import (
+    Client, RequestFactory, SimpleTestCase, TransactionTestCase,
+    override_settings
+)
+from django.urls import reverse
+
+from posts import views
+from posts.models import Post
+
+from . import db_router, metrics, querylog, response_cache
+from .query_budget import QueryBudget, QueryBudgetExceeded
+from .sqlite import retry_on_lock
+
+User = get_user_model()
+
+
+class ResponseCacheTest(SimpleTestCase):
+
+    def test_page_purged_while_rendering_is_not_cached(self):
+        purge_during_render = True
+
+        @response_cache.cache_anonymous
+        def view(request):
+            if purge_during_render:
+                response_cache.purge('post:1')
+            return response_cache.add_surrogate_keys(
+                HttpResponse('Пост'), 'post:1'
+            )
+
+        def get():
+            request = RequestFactory().get('/posts/1/')
+            request.user = AnonymousUser()
+            return view(request)['X-Cache']
+
+        cache.clear()
+        self.assertEqual(get(), 'MISS')
+        purge_during_render = False
+        self.assertEqual(get(), 'MISS')
+        self.assertEqual(get(), 'HIT')
+
+    def test_lost_version_key_invalidates_pages(self):
+        versions = response_cache.versions('post:1')
+        # Так ключ версии теряется при вытеснении из кэша.
+        cache.delete(response_cache._tag_key('post:1'))
+        self.assertNotEqual(response_cache.versions('post:1'), versions)
+
+    def test_purge_of_non_ascii_tag(self):
+        tag = 'group:Тестовый слаг'
+        before = response_cache._versions([tag])
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            response_cache.purge(tag)
+            self.assertNotEqual(response_cache._versions([tag]), before)
+
+
+@override_settings(SQLITE_LOCK_RETRY_DELAY=0.001)
+class SqliteTest(TransactionTestCase):
+
+    def test_pragmas_are_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            # 1 — NORMAL.
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_retry_on_lock(self):
+        func = mock.Mock(side_effect=[
+            OperationalError('database is locked'), 'done'
+        ])
+        func.__qualname__ = 'func'
+        self.assertEqual(retry_on_lock(func)(), 'done')
+        self.assertEqual(func.call_count, 2)
+
+    def test_retry_gives_up(self):
+        func = mock.Mock(side_effect=OperationalError('database is locked'))
+        func.__qualname__ = 'func'
+        with self.assertRaises(OperationalError):
+            retry_on_lock(attempts=3)(func)()
+        self.assertEqual(func.call_count, 3)
+
+    def test_other_errors_are_not_retried(self):
+        func = mock.Mock(side_effect=OperationalError('no such table'))
+        func.__qualname__ = 'func'
+        with self.assertRaises(OperationalError):
+            retry_on_lock(func)()
+        self.assertEqual(func.call_count, 1)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command(
+            'benchmark_sqlite', threads=2, seconds=0.2, stdout=out
+        )
+        self.assertIn('default:', out.getvalue())
+        self.assertIn('tuned:', out.getvalue())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(TransactionTestCase):
+    """Реплика — копия тестовой базы в файле, снятая в setUp."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.old_post = Post.objects.create(author=self.author, text='Старый')
+        # Сессия должна попасть в реплику, иначе вход на ней не виден.
+        self.reader = Client()
+        self.reader.force_login(self.author)
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, 'replica.sqlite3')
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM INTO %s', [path])
+        connections.databases['replica'] = dict(
+            connections.databases['default'], NAME=path
+        )
+        self.new_post = Post.objects.create(author=self.author, text='Новый')
+
+    def tearDown(self):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.databases['replica']
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_read_only_views_read_from_replica(self):
+        response = self.reader.get(reverse('posts:index'))
+        self.assertContains(response, 'Старый')
+        self.assertNotContains(response, 'Новый')
+        self.assertNotIn(db_router.PRIMARY_COOKIE, response.cookies)
+        response = self.reader.get(
+            reverse('posts:post_detail', args=[self.new_post.pk])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_cached_responses_are_read_from_primary(self):
+        # Фрагмент ленты, прочитанный с реплики, не сохраняется.
+        self.assertNotContains(
+            self.reader.get(reverse('posts:index')), 'Новый'
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'Новый')
+        self.assertContains(self.client.get(reverse('posts:index')), 'Новый')
+
+    def test_query_budget_counts_replica_queries(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with QueryBudget(0, raise_exception=True):
+                list(Post.objects.using('replica').all())
+        with QueryBudget(1, using='default') as budget:
+            list(Post.objects.using('replica').all())
+        self.assertEqual(budget.count, 0)
+
+    def test_other_reads_use_primary(self):
+        self.assertEqual(
+            db_router.ReplicaRouter().db_for_read(Post), 'default'
+        )
+        response = self.client.get(
+            reverse('api:post_detail', args=[self.new_post.pk])
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_reads_stick_to_primary_after_write(self):
+        client = Client()
+        client.force_login(self.author)
+        response = client.post(
+            reverse('posts:add_comment', args=[self.old_post.pk]),
+            {'text': 'Комментарий'}
+        )
+        self.assertIn(db_router.PRIMARY_COOKIE, response.cookies)
+        response = client.get(reverse('posts:index'))
+        self.assertContains(response, 'Новый')
+
+
+class MetricsTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        overridden = override_settings(
+            METRICS_DIR=directory, METRICS_FLUSH_INTERVAL=0
+        )
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        self.directory = directory
+        metrics.registry.reset()
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Пост')
+
+    @override_settings(METRICS_SERVER_TIMING=False)
+    def test_server_timing_is_opt_in(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(METRICS_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'app;dur=[\d.]+')
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn('tpl;dur=', timing)
+        self.assertIn('cache;desc=miss', timing)
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('cache;desc=hit', response['Server-Timing'])
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(
+            reverse('metrics'), REMOTE_ADDR='127.0.0.1'
+        )
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            text
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"} 2',
+            text
+        )
+        self.assertIn(
+            'yatube_requests_total{status="200",view="posts:index"} 2', text
+        )
+        self.assertIn(
+            'yatube_response_cache_total{result="hit",view="posts:index"} 1',
+            text
+        )
+        response = self.client.get(
+            reverse('metrics'), REMOTE_ADDR='192.0.2.1'
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.content, b'')
+
+    def test_metrics_are_summed_across_processes(self):
+        timing = metrics.Timing()
+        timing.total = 0.02
+        metrics.observe('posts:index', 200, timing)
+        child = multiprocessing.get_context('fork').Process(
+            target=metrics.observe, args=('posts:index', 200, timing)
+        )
+        child.start()
+        child.join()
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            metrics.render()
+        )
+
+
+class ViewRecorderMiddleware:
+    """Запоминает представления, дошедшие до process_view."""
+    views = []
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.views.append(request.resolver_match.view_name)
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class QueryBudgetMiddlewareTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Пост')
+
+    def test_view_is_called_by_django(self):
+        ViewRecorderMiddleware.views = []
+        middleware = settings.MIDDLEWARE + [
+            'core.tests.ViewRecorderMiddleware'
+        ]
+        with override_settings(MIDDLEWARE=middleware):
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ViewRecorderMiddleware.views, ['posts:index'])
+
+    def test_budget_counts_view_queries(self):
+        with mock.patch.object(views.index, 'query_budget', 0):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            self.client.get(reverse('posts:index')).status_code, 200
+        )
+
+
+class QueryLogTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.log = os.path.join(directory, 'slow.jsonl')
+        overridden = override_settings(SLOW_QUERY_LOG=self.log)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Пост')
+
+    def test_queries_are_tagged_with_view_and_call_site(self):
+        executed = []
+
+        def capture(execute, sql, params, many, context):
+            executed.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            self.client.get(reverse('posts:index'))
+        self.assertTrue(executed)
+        self.assertTrue(all(
+            "view='posts:index'" in sql for sql in executed
+            if 'posts_post' in sql
+        ))
+        self.assertTrue(any(
+            "site='posts/views.py:" in sql for sql in executed
+        ))
+
+    def test_normalize(self):
+        self.assertEqual(
+            querylog.normalize(
+                "SELECT * FROM t WHERE a = 'x' AND b IN (1, 2, %s) "
+                "/* view='v' */"
+            ),
+            'SELECT * FROM t WHERE a = ? AND b IN (...)'
+        )
+        self.assertEqual(
+            querylog.fingerprint('SELECT 1 FROM t WHERE id = 5'),
+            querylog.fingerprint('SELECT 1  FROM t WHERE id = %s')
+        )
+
+    def test_slow_queries_are_logged_and_summarized(self):
+        self.assertFalse(os.path.exists(self.log))
+        with override_settings(SLOW_QUERY_MS=0):
+            self.client.get(reverse('posts:index'))
+        entries = list(querylog.read_log(self.log))
+        selects = [
+            entry for entry in entries
+            if entry['view'] == 'posts:index'
+            and entry['query'].startswith('SELECT')
+        ]
+        self.assertTrue(selects)
+        self.assertTrue(all(entry['plan'] for entry in selects))
+        self.assertTrue(all(entry['fingerprint'] for entry in selects))
+        self.assertFalse(any(
+            'params' in entry or 'sql' in entry for entry in entries
+        ))
+        self.assertEqual(os.stat(self.log).st_mode & 0o777, 0o600)
+        out = StringIO()
+        call_command('slow_queries', top=3, view='posts:index', stdout=out)
+        output = out.getvalue()
+        self.assertIn('#1', output)
+        self.assertIn('представления: posts:index', output)
+        self.assertIn('план:', output)
@@ -1,6 +1,10 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
 from http import HTTPStatus
 
+from . import metrics as metrics_registry
+
 
 def page_not_found(request, exception):
     return render(
@@ -11,8 +15,12 @@ def page_not_found(request, exception):
     )
 
 
-def permission_denied(request, reason=''):
-    return render(request, 'core/403csrf.html')
+def permission_denied(request, exception=None):
+    return render(
+        request,
+        'core/403csrf.html',
+        status=HTTPStatus.FORBIDDEN
+    )
 
 
 def server_error(request):
@@ -21,3 +29,16 @@ def server_error(request):
         'core/500.html',
         status=HTTPStatus.INTERNAL_SERVER_ERROR
     )
+
+
+def metrics(request):
+    """Гистограммы всех процессов в формате Prometheus.
+
+    Доступ проверяется по REMOTE_ADDR, поэтому за обратным прокси
+    /metrics нужно закрыть на самом прокси.
+    """
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics_registry.render(), content_type=metrics_registry.CONTENT_TYPE
+    )
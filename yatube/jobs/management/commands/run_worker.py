@@ -0,0 +1,85 @@
+import multiprocessing
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from jobs import queue
+
+
+def _run_threads(threads, poll_interval, once, stop=None):
+    stop = stop or threading.Event()
+    workers = [
+        threading.Thread(
+            target=queue.work, args=(stop, poll_interval, once),
+            name=f'worker-{number}'
+        )
+        for number in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            while worker.is_alive():
+                worker.join(timeout=1)
+    except KeyboardInterrupt:
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+
+def _run_process(threads, poll_interval, once):
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    _run_threads(threads, poll_interval, once, stop)
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=settings.JOBS_WORKER_THREADS,
+            help='Потоков в каждом процессе'
+        )
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Процессов-воркеров'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться'
+        )
+
+    def handle(self, *args, **options):
+        threads, processes = options['threads'], options['processes']
+        if threads < 1 or processes < 1:
+            raise CommandError('Нужен хотя бы один поток и один процесс')
+        self.stdout.write(
+            f'Воркер: процессов {processes}, потоков в каждом {threads}'
+        )
+        worker_args = (threads, options['poll_interval'], options['once'])
+        if processes == 1:
+            _run_threads(*worker_args)
+            return
+        # Соединения с БД нельзя наследовать дочерним процессам.
+        connections.close_all()
+        children = [
+            multiprocessing.Process(target=_run_process, args=worker_args)
+            for _ in range(processes)
+        ]
+        for child in children:
+            child.start()
+        try:
+            for child in children:
+                child.join()
+        except KeyboardInterrupt:
+            for child in children:
+                child.terminate()
+                child.join()
@@ -0,0 +1,193 @@
+"""Очередь фоновых задач в таблице jobs_job.
+
+Функция, помеченная @task, ставится в очередь вызовом .delay(**kwargs):
+в той же транзакции, что и изменения, ради которых она нужна, пишется
+строка Job. Воркеры (manage.py run_worker) забирают готовые задачи
+условным UPDATE: из нескольких воркеров задачу получает только тот,
+чей UPDATE изменил строку, поэтому внешний брокер не нужен и хватает
+SQLite. Забранная задача невидима для остальных до истечения
+visibility timeout, упавшая повторяется с экспоненциальной задержкой.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.sqlite import retry_on_lock
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+# Сколько ближайших задач пробовать забрать, если их перехватили другие.
+CLAIM_CANDIDATES = 10
+MAX_RETRY_DELAY = 60 * 60
+
+
+class Task:
+
+    def __init__(self, func, name, max_attempts, retry_delay, timeout):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, **kwargs):
+        """Ставит вызов в очередь; аргументы должны сериализоваться в JSON.
+        """
+        return self.delay_by(0, **kwargs)
+
+    def delay_by(self, seconds, **kwargs):
+        """Как delay(), но задача выполнится не раньше чем через seconds."""
+        return Job.objects.create(
+            name=self.name,
+            payload=json.dumps(kwargs),
+            max_attempts=self.max_attempts,
+            run_at=timezone.now() + timedelta(seconds=seconds),
+        )
+
+    def retry_at(self, attempts):
+        delay = min(self.retry_delay * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+        return timezone.now() + timedelta(seconds=delay)
+
+
+def task(func=None, *, max_attempts=5, retry_delay=10, timeout=None):
+    """Регистрирует функцию как фоновую задачу.
+
+    retry_delay — задержка перед первым повтором в секундах, дальше она
+    удваивается; timeout — visibility timeout, по умолчанию
+    JOBS_VISIBILITY_TIMEOUT.
+    """
+    def register(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+        registry[name] = Task(
+            func, name, max_attempts, retry_delay,
+            timeout or settings.JOBS_VISIBILITY_TIMEOUT
+        )
+        return registry[name]
+    if func is not None:
+        return register(func)
+    return register
+
+
+def _ready(now):
+    return (
+        Q(status=Job.QUEUED, run_at__lte=now)
+        | Q(status=Job.RUNNING, locked_until__lt=now)
+    )
+
+
+def _timeout(name):
+    found = registry.get(name)
+    return found.timeout if found else settings.JOBS_VISIBILITY_TIMEOUT
+
+
+def claim(worker_id):
+    """Забирает ближайшую готовую задачу или возвращает None."""
+    now = timezone.now()
+    candidates = Job.objects.filter(_ready(now)).order_by(
+        'run_at', 'pk'
+    ).values_list('pk', 'name')[:CLAIM_CANDIDATES]
+    for pk, name in candidates:
+        claimed = Job.objects.filter(_ready(now), pk=pk).update(
+            status=Job.RUNNING,
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=_timeout(name)),
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+@retry_on_lock
+def _mark(job, **fields):
+    """Записывает итог задачи, если она всё ещё за этим воркером."""
+    return Job.objects.filter(
+        pk=job.pk, locked_by=job.locked_by
+    ).update(**fields)
+
+
+def execute(job):
+    """Выполняет забранную задачу и записывает результат.
+
+    Если итог не удалось записать даже после повторов, OperationalError
+    уходит наверх, а задача остаётся забранной и после visibility
+    timeout достанется воркерам снова.
+    """
+    found = registry.get(job.name)
+    try:
+        if found is None:
+            raise LookupError(f'Задача {job.name} не зарегистрирована')
+        found.func(**json.loads(job.payload))
+    except Exception:
+        logger.exception('Задача %s завершилась ошибкой', job)
+        error = traceback.format_exc()
+        if found is None or job.attempts >= job.max_attempts:
+            _mark(
+                job, status=Job.FAILED, finished=timezone.now(),
+                locked_until=None, last_error=error
+            )
+        else:
+            _mark(
+                job, status=Job.QUEUED, run_at=found.retry_at(job.attempts),
+                locked_until=None, last_error=error
+            )
+        return False
+    _mark(job, status=Job.DONE, finished=timezone.now(), locked_until=None)
+    return True
+
+
+def worker_id():
+    thread = threading.current_thread().name
+    return f'{socket.gethostname()}:{os.getpid()}:{thread}'
+
+
+def run_pending(limit=None):
+    """Выполняет готовые задачи в текущем потоке, возвращает их число."""
+    done = 0
+    name = worker_id()
+    while limit is None or done < limit:
+        job = claim(name)
+        if job is None:
+            break
+        execute(job)
+        done += 1
+    return done
+
+
+def work(stop, poll_interval, once=False):
+    """Цикл воркера: выполняет задачи, пока не установлен stop."""
+    name = worker_id()
+    while not stop.is_set():
+        try:
+            job = claim(name)
+        except OperationalError:
+            # SQLite занят другим писателем — попробуем позже.
+            logger.warning('Не удалось забрать задачу', exc_info=True)
+            job = None
+        if job is not None:
+            try:
+                execute(job)
+            except OperationalError:
+                logger.warning(
+                    'Не удалось записать итог задачи %s', job, exc_info=True
+                )
+        elif once:
+            break
+        else:
+            stop.wait(poll_interval)
+        close_old_connections()
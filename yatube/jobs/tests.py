@@ -0,0 +1,127 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import OperationalError
+from django.db.models.query import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import queue
+from .models import Job
+
+calls = []
+
+
+@queue.task
+def remember(value):
+    calls.append(value)
+
+
+@queue.task(max_attempts=2, retry_delay=60)
+def explode():
+    raise ValueError('boom')
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        super().setUp()
+        calls.clear()
+
+    def test_delay_queues_and_worker_runs(self):
+        job = remember.delay(value=1)
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(calls, [])
+        self.assertEqual(queue.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(calls, [1])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job = explode.delay()
+        queue.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=50))
+        self.assertIn('boom', job.last_error)
+        self.assertEqual(queue.run_pending(), 0)
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        queue.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_unknown_task_fails_without_retry(self):
+        job = Job.objects.create(name='missing.task', run_at=timezone.now())
+        queue.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    def test_expired_job_is_claimed_again(self):
+        job = remember.delay(value=2)
+        stale = queue.claim('stale-worker')
+        self.assertIsNone(queue.claim('other-worker'))
+        Job.objects.filter(pk=job.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        fresh = queue.claim('other-worker')
+        self.assertEqual(fresh.pk, job.pk)
+        self.assertEqual(fresh.attempts, 2)
+        queue.execute(stale)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertEqual(job.locked_by, 'other-worker')
+        queue.execute(fresh)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+
+
+class RunWorkerCommandTest(TransactionTestCase):
+    """Воркер работает в своих потоках и видит только закоммиченное."""
+
+    def setUp(self):
+        super().setUp()
+        calls.clear()
+
+    def test_run_worker_once(self):
+        remember.delay(value=3)
+        remember.delay(value=4)
+        call_command('run_worker', '--once', '--threads=1', stdout=StringIO())
+        self.assertEqual(sorted(calls), [3, 4])
+        self.assertFalse(Job.objects.exclude(status=Job.DONE).exists())
+
+
+@override_settings(SQLITE_LOCK_RETRY_DELAY=0.001)
+class JobLockTest(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def locked_on_done(self, failures):
+        """QuerySet.update, падающий на отметке DONE failures раз."""
+        original = QuerySet.update
+
+        def update(queryset, **kwargs):
+            if kwargs.get('status') == Job.DONE and failures:
+                failures.pop()
+                raise OperationalError('database is locked')
+            return original(queryset, **kwargs)
+        return mock.patch.object(QuerySet, 'update', update)
+
+    def test_lock_while_marking_done_is_retried(self):
+        job = remember.delay(value=3)
+        with self.locked_on_done([1]):
+            self.assertEqual(queue.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+
+    def test_worker_survives_persistent_lock(self):
+        job = remember.delay(value=4)
+        with self.locked_on_done([1] * 100):
+            queue.work(threading.Event(), 0, once=True)
+        job.refresh_from_db()
+        self.assertEqual(calls, [4])
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertIsNotNone(job.locked_until)
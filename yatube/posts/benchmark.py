@@ -0,0 +1,155 @@
+"""Замеры представлений постов через тестовый клиент.
+
+Каждое представление запрашивается несколько раз с очищенным кэшем, чтобы
+кэш фрагментов не прятал запросы к базе. Для каждого записываются
+перцентили времени ответа, число SQL-запросов, их суммарное время и
+размер ответа; compare() сверяет результат с сохранённым эталоном.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from users.models import Profile
+
+from .models import Group, Post
+
+User = get_user_model()
+
+# Адрес не из INTERNAL_IPS: панель отладки не должна попадать в замеры.
+REMOTE_ADDR = '192.0.2.1'
+# Свой кэш на время замеров: cache.clear() не должен очищать кэш сайта.
+ISOLATED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    },
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class SqlTimer:
+    """Считает запросы и их время через execute_wrapper."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def percentile(values, share):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(int(round(share * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def scenarios():
+    """(имя, метод, url, данные) для самых тяжёлых объектов базы."""
+    group = Group.objects.order_by('-posts_count', 'pk').first()
+    author = Profile.objects.select_related('user').order_by(
+        '-posts_count', 'pk'
+    ).first().user
+    post = Post.objects.order_by('-comments_count', 'pk').first()
+    reader = Profile.objects.select_related('user').order_by(
+        '-following_count', 'pk'
+    ).first().user
+    return reader, [
+        ('index', 'get', reverse('posts:index'), None),
+        ('group_posts', 'get',
+         reverse('posts:group_posts', args=[group.slug]), None),
+        ('profile', 'get',
+         reverse('posts:profile', args=[author.username]), None),
+        ('post_detail', 'get',
+         reverse('posts:post_detail', args=[post.pk]), None),
+        ('follow_index', 'get', reverse('posts:follow_index'), None),
+        ('post_create', 'post', reverse('posts:post_create'),
+         {'text': 'Пост для замера', 'group': group.pk}),
+    ]
+
+
+def measure(client, method, url, data, requests, warmup):
+    latencies, queries, sql_times, sizes = [], [], [], []
+    for number in range(warmup + requests):
+        cache.clear()
+        timer = SqlTimer()
+        with connection.execute_wrapper(timer):
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data)
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise RuntimeError(f'{url}: ответ {response.status_code}')
+        if number < warmup:
+            continue
+        latencies.append(elapsed * 1000)
+        queries.append(timer.count)
+        sql_times.append(timer.seconds * 1000)
+        sizes.append(len(response.content))
+    return {
+        'p50_ms': round(percentile(latencies, 0.5), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'queries': max(queries),
+        'sql_ms': round(percentile(sql_times, 0.5), 2),
+        'bytes': max(sizes),
+    }
+
+
+def run(requests=50, warmup=5):
+    """Замеры всех сценариев; записи в базу, включая сессию входа,
+    откатываются."""
+    results = {}
+    reader, cases = scenarios()
+    client = Client(REMOTE_ADDR=REMOTE_ADDR)
+    try:
+        with override_settings(CACHES=ISOLATED_CACHES), transaction.atomic():
+            client.force_login(reader)
+            for name, method, url, data in cases:
+                results[name] = measure(
+                    client, method, url, data, requests, warmup
+                )
+            raise Rollback
+    except Rollback:
+        pass
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Регрессии относительно эталона: список строк.
+
+    Время p95 и размер ответа могут вырасти не больше чем в
+    1 + threshold раз, число запросов не может вырасти вовсе.
+    """
+    regressions = []
+    for name, expected in baseline.items():
+        actual = results.get(name)
+        if actual is None:
+            regressions.append(f'{name}: нет замера')
+            continue
+        if actual['queries'] > expected['queries']:
+            regressions.append(
+                f'{name}: запросов {actual["queries"]}, '
+                f'в эталоне {expected["queries"]}'
+            )
+        for metric in ('p95_ms', 'bytes'):
+            limit = expected[metric] * (1 + threshold)
+            if actual[metric] > limit:
+                regressions.append(
+                    f'{name}: {metric} {actual[metric]}, в эталоне '
+                    f'{expected[metric]} (допустимо до {limit:.2f})'
+                )
+    return regressions
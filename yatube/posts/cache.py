@@ -0,0 +1,65 @@
+"""Инвалидация кэшей постов.
+
+Ключи фрагментов лент включают поколение. Любое изменение постов,
+групп или пользователей заменяет поколение новым, и все старые
+фрагменты перестают использоваться, поэтому их можно хранить часами.
+Кэш страниц для анонимов (core.response_cache) сбрасывается точечно
+по суррогатным ключам из surrogate_keys(). Сигналы (posts.signals)
+сбрасывают кэши только после фиксации транзакции.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import db_router
+
+GENERATION_KEY = 'posts:generation'
+
+
+def _new_generation():
+    # Не счётчик, а новое уникальное значение: cache.incr в общем файловом
+    # кэше — это get и set, и одновременные увеличения теряются. Поколения
+    # только сравниваются на равенство, поэтому потерянный (вытесненный)
+    # ключ просто получает значение, которого ещё не было.
+    return uuid.uuid4().hex
+
+
+def get_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, _new_generation(), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    generation = _new_generation()
+    cache.set(GENERATION_KEY, generation, timeout=None)
+    return generation
+
+
+def cache_context():
+    """Переменные для {% cache %} в шаблонах лент.
+
+    Фрагмент, прочитанный с отстающей реплики, не сохраняется (срок 0),
+    иначе он переживёт сброс поколения.
+    """
+    timeout = settings.POSTS_CACHE_TIMEOUT
+    if db_router.on_replica():
+        timeout = 0
+    return {
+        'cache_timeout': timeout,
+        'cache_version': get_generation(),
+    }
+
+
+def surrogate_keys(post, group_slugs=None):
+    """Суррогатные ключи страниц, которые показывают пост."""
+    if group_slugs is None:
+        group_slugs = [post.group.slug] if post.group_id else []
+    return (
+        f'post:{post.pk}',
+        f'author:{post.author.username}',
+        *(f'group:{slug}' for slug in group_slugs),
+    )
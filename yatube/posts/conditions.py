@@ -0,0 +1,90 @@
+"""Валидаторы условного GET (ETag) для страниц постов.
+
+Каждый валидатор — один лёгкий агрегирующий запрос по индексам
+(author, edit_date), (group, edit_date) или по первичному ключу поста.
+Кроме даты последнего изменения в ETag входят счётчики, поэтому
+удаление поста или комментария тоже меняет ETag, а также имена автора
+и название группы, которые показывает страница. Имена авторов постов
+группы по одному запросу не собрать, поэтому ETag группы берёт версию
+суррогатного ключа ALL: сигналы меняют её при любом изменении
+пользователя. Страница зависит от пользователя (кнопки, формы), так что
+в ETag входит и его id.
+
+Last-Modified не отдаётся: дата последнего изменения среди оставшихся
+постов после удаления самого нового поста или его переноса в другую
+группу уходит назад, и клиент с одним If-Modified-Since получил бы 304
+со старой страницей. Лента всего сайта вместо запроса по всей таблице
+постов берёт версии суррогатных ключей кэша страниц: сигналы
+меняют их при любом изменении, которое видно в ленте.
+"""
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.db.models import Max
+from django.views.decorators.http import condition
+
+from core import response_cache
+
+from .models import Group, Post
+
+User = get_user_model()
+
+
+def _index_state():
+    return response_cache.versions('index', response_cache.ALL)
+
+
+def _profile_state(username):
+    return User.objects.filter(username=username).values(
+        'first_name', 'last_name', 'profile__posts_count',
+        'profile__followers_count'
+    ).annotate(last_edit=Max('posts__edit_date')).first()
+
+
+def _group_state(slug):
+    state = Group.objects.filter(slug=slug).values(
+        'title', 'description', 'posts_count'
+    ).annotate(last_edit=Max('posts__edit_date')).first()
+    if state is not None:
+        state['authors'] = response_cache.versions(response_cache.ALL)
+    return state
+
+
+def _post_state(post_id):
+    return Post.objects.filter(pk=post_id).values(
+        'edit_date', 'comments_count', 'author__first_name',
+        'author__last_name', 'author__profile__posts_count', 'group__title'
+    ).annotate(last_comment=Max('comments__pub_date')).first()
+
+
+def _cached_state(request, key, compute):
+    """Состояние страницы, вычисленное один раз на запрос."""
+    states = request.__dict__.setdefault('_conditional_states', {})
+    if key not in states:
+        states[key] = compute()
+    return states[key]
+
+
+def conditional_page(state_func):
+    """Декоратор: ETag по state_func(**view_kwargs)."""
+    def get_state(request, *args, **kwargs):
+        return _cached_state(
+            request,
+            (state_func.__name__, args, tuple(sorted(kwargs.items()))),
+            lambda: state_func(*args, **kwargs)
+        )
+
+    def etag(request, *args, **kwargs):
+        state = get_state(request, *args, **kwargs)
+        if state is None:
+            return None
+        raw = repr((sorted(state.items()), request.user.pk))
+        return 'W/"%s"' % hashlib.md5(raw.encode()).hexdigest()
+
+    return condition(etag_func=etag)
+
+
+conditional_index = conditional_page(_index_state)
+conditional_profile = conditional_page(_profile_state)
+conditional_group = conditional_page(_group_state)
+conditional_post = conditional_page(_post_state)
@@ -0,0 +1,151 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарными UPDATE ... SET x = x ± 1 через F(),
+поэтому параллельные запросы не теряют инкременты. recount()
+пересчитывает значения пачками и исправляет накопившиеся расхождения.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F
+
+from users.models import Profile
+
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+
+def _change(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def post_added(post, delta=1):
+    with transaction.atomic():
+        _change(Profile.objects.filter(user_id=post.author_id),
+                'posts_count', delta)
+        if post.group_id:
+            _change(Group.objects.filter(pk=post.group_id),
+                    'posts_count', delta)
+
+
+def post_moved(old_group_id, new_group_id):
+    with transaction.atomic():
+        if old_group_id:
+            _change(Group.objects.filter(pk=old_group_id), 'posts_count', -1)
+        if new_group_id:
+            _change(Group.objects.filter(pk=new_group_id), 'posts_count', 1)
+
+
+def comment_added(comment, delta=1):
+    _change(Post.objects.filter(pk=comment.post_id), 'comments_count', delta)
+
+
+def follow_added(follow, delta=1):
+    with transaction.atomic():
+        _change(Profile.objects.filter(user_id=follow.user_id),
+                'following_count', delta)
+        _change(Profile.objects.filter(user_id=follow.author_id),
+                'followers_count', delta)
+
+
+def _batches(queryset, batch_size):
+    """Первичные ключи queryset пачками по batch_size."""
+    last_pk = 0
+    while True:
+        pks = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return
+        yield pks
+        last_pk = pks[-1]
+
+
+def _counts(queryset, key):
+    return dict(
+        queryset.values_list(key).annotate(count=Count('pk')).order_by()
+    )
+
+
+def _repair(model, pks, fields, batch_size, key='pk'):
+    """Сверяет поля объектов pks с ожидаемыми значениями fields.
+
+    fields — словарь {поле: {значение key: счётчик}}; возвращает число
+    исправленных строк.
+    """
+    changed = []
+    for obj in model.objects.filter(pk__in=pks).only(key, *fields):
+        dirty = False
+        for field, counts in fields.items():
+            expected = counts.get(getattr(obj, key), 0)
+            if getattr(obj, field) != expected:
+                setattr(obj, field, expected)
+                dirty = True
+        if dirty:
+            changed.append(obj)
+    model.objects.bulk_update(changed, list(fields), batch_size=batch_size)
+    return len(changed)
+
+
+def recount_profiles(batch_size=BATCH_SIZE):
+    missing = User.objects.filter(profile__isnull=True).values_list(
+        'pk', flat=True
+    )
+    # Без batch_size: Django 2.2 не ограничивает явный размер пачки
+    # лимитом SQLite на число слагаемых составного SELECT.
+    Profile.objects.bulk_create([Profile(user_id=pk) for pk in missing])
+    repaired = 0
+    for pks in _batches(Profile.objects.all(), batch_size):
+        with transaction.atomic():
+            user_ids = Profile.objects.filter(pk__in=pks).values('user_id')
+            repaired += _repair(Profile, pks, {
+                'posts_count': _counts(
+                    Post.objects.filter(author_id__in=user_ids), 'author_id'
+                ),
+                'followers_count': _counts(
+                    Follow.objects.filter(author_id__in=user_ids),
+                    'author_id'
+                ),
+                'following_count': _counts(
+                    Follow.objects.filter(user_id__in=user_ids), 'user_id'
+                ),
+            }, batch_size, key='user_id')
+    return repaired
+
+
+def recount_posts(batch_size=BATCH_SIZE):
+    repaired = 0
+    for pks in _batches(Post.objects.all(), batch_size):
+        with transaction.atomic():
+            repaired += _repair(Post, pks, {
+                'comments_count': _counts(
+                    Comment.objects.filter(post_id__in=pks), 'post_id'
+                ),
+            }, batch_size)
+    return repaired
+
+
+def recount_groups(batch_size=BATCH_SIZE):
+    repaired = 0
+    for pks in _batches(Group.objects.all(), batch_size):
+        with transaction.atomic():
+            repaired += _repair(Group, pks, {
+                'posts_count': _counts(
+                    Post.objects.filter(group_id__in=pks), 'group_id'
+                ),
+            }, batch_size)
+    return repaired
+
+
+def recount(batch_size=BATCH_SIZE):
+    """Пересчитывает все счётчики, возвращает число исправленных строк."""
+    return {
+        'profiles': recount_profiles(batch_size),
+        'posts': recount_posts(batch_size),
+        'groups': recount_groups(batch_size),
+    }
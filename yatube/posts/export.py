@@ -0,0 +1,93 @@
+"""Потоковая выгрузка постов автора в JSON Lines или CSV.
+
+Посты читаются .iterator(chunk_size=...) и сразу кодируются и сжимаются
+по кускам, поэтому память не зависит от числа постов. Записи JSONL
+в том же формате, что читает import_yatube.
+"""
+import csv
+import json
+import zlib
+
+from .models import Post
+
+CHUNK_SIZE = 2000
+# Сколько байт копить перед тем, как отдать кусок клиенту или в файл.
+BUFFER_SIZE = 64 * 1024
+FIELDS = ('type', 'id', 'author', 'group', 'text', 'pub_date', 'image')
+FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def records(author):
+    posts = Post.objects.filter(author=author).order_by('pk').values_list(
+        'id', 'group__slug', 'text', 'pub_date', 'image'
+    )
+    for post_id, group, text, pub_date, image in posts.iterator(
+        chunk_size=CHUNK_SIZE
+    ):
+        yield {
+            'type': 'post',
+            'id': post_id,
+            'author': author.username,
+            'group': group or '',
+            'text': text,
+            'pub_date': pub_date.isoformat(),
+            'image': image,
+        }
+
+
+def _jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+class _Line:
+    """Файл для csv.writer, который возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def _csv(rows):
+    writer = csv.writer(_Line())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        yield writer.writerow([row[field] for field in FIELDS])
+
+
+def _buffered(chunks):
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        if chunk:
+            buffer.append(chunk)
+            size += len(chunk)
+        if size >= BUFFER_SIZE:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        yield compressor.compress(chunk)
+    yield compressor.flush()
+
+
+def stream(author, file_format='jsonl', compress=True):
+    """Куски байт выгрузки постов author."""
+    encode = _csv if file_format == 'csv' else _jsonl
+    chunks = (line.encode() for line in encode(records(author)))
+    if compress:
+        chunks = _gzip(chunks)
+    return _buffered(chunks)
+
+
+def filename(author, file_format='jsonl', compress=True):
+    name = f'{author.username}-posts.{file_format}'
+    return f'{name}.gz' if compress else name
@@ -0,0 +1,139 @@
+"""RSS и Atom для ленты, групп и авторов.
+
+Ленты опрашиваются часто и почти всегда без изменений, поэтому они
+отдаются через тот же кэш страниц для анонимов, что и HTML: ответ
+помечен суррогатными ключами index, group:SLUG и author:USERNAME и
+сбрасывается сигналами при изменении постов. ETag ставят те же
+валидаторы, что и у страниц, так что повторный опрос стоит 304 без
+обращения к базе.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+
+from core.query_budget import query_budget
+from core.response_cache import add_surrogate_keys, cache_anonymous
+
+from .conditions import (
+    conditional_group, conditional_index, conditional_profile
+)
+from .models import Group, Post
+
+User = get_user_model()
+
+FEED_SIZE = 20
+
+
+class PostFeed(Feed):
+
+    def item_title(self, post):
+        first_line = post.text.strip().split('\n', 1)[0]
+        return Truncator(first_line).chars(80)
+
+    def item_description(self, post):
+        return post.text
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', args=[post.pk])
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_updateddate(self, post):
+        return post.edit_date
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_categories(self, post):
+        return [post.group.title] if post.group_id else []
+
+    def latest(self, posts):
+        return posts.select_related('author', 'group').order_by(
+            '-pub_date', '-id'
+        )[:FEED_SIZE]
+
+
+class IndexFeed(PostFeed):
+    title = 'Yatube'
+    description = 'Последние обновления на сайте'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def items(self):
+        return self.latest(Post.objects.all())
+
+
+class GroupFeed(PostFeed):
+
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Записи сообщества {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_posts', args=[group.slug])
+
+    def items(self, group):
+        return self.latest(group.posts.all())
+
+
+class ProfileFeed(PostFeed):
+
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'Посты {author.get_full_name() or author.username}'
+
+    def description(self, author):
+        return self.title(author)
+
+    def link(self, author):
+        return reverse('posts:profile', args=[author.username])
+
+    def items(self, author):
+        return self.latest(author.posts.all())
+
+
+def atom(feed_class):
+    return type(
+        f'Atom{feed_class.__name__}', (feed_class,),
+        {'feed_type': Atom1Feed, 'subtitle': feed_class.description}
+    )
+
+
+def feed_view(feed_class, condition, surrogate_key):
+    """Представление ленты с кэшем для анонимов и условным GET."""
+    feed = feed_class()
+
+    @query_budget(3)
+    @cache_anonymous
+    @condition
+    def view(request, **kwargs):
+        response = feed(request, **kwargs)
+        # Feed ставит Last-Modified по самому новому посту, а эта дата
+        # уходит назад при его удалении (см. posts.conditions).
+        del response['Last-Modified']
+        return add_surrogate_keys(response, surrogate_key.format(**kwargs))
+    return view
+
+
+index_rss = feed_view(IndexFeed, conditional_index, 'index')
+index_atom = feed_view(atom(IndexFeed), conditional_index, 'index')
+group_rss = feed_view(GroupFeed, conditional_group, 'group:{slug}')
+group_atom = feed_view(atom(GroupFeed), conditional_group, 'group:{slug}')
+profile_rss = feed_view(
+    ProfileFeed, conditional_profile, 'author:{username}'
+)
+profile_atom = feed_view(
+    atom(ProfileFeed), conditional_profile, 'author:{username}'
+)
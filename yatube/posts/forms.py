@@ -7,6 +7,15 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ["text", "group", "image"]
 
+    def clean(self):
+        """Вместо ошибки ImageField о пустом файле — причина отбраковки."""
+        image = self.files.get(self.add_prefix("image"))
+        error = getattr(image, "upload_error", None)
+        if error:
+            self.errors.pop("image", None)
+            self.add_error("image", error)
+        return super().clean()
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,333 @@
+"""Потоковый импорт групп, пользователей, постов, комментариев и подписок.
+
+Записи читаются из JSONL или CSV по одной и копятся в пачки, пачка
+пишется bulk_create в одной транзакции. Авторы и группы ищутся через
+словари username → id и slug → id, которые дозаполняются одним
+запросом на пачку; незнакомые авторы создаются без пароля. Посты и
+комментарии сохраняют id из источника, а повторная вставка
+существующих строк пропускается, поэтому повтор пачки после сбоя
+ничего не дублирует. Если же под тем же id в базе другой пост или
+комментарий (другой автор, текст или пост), пачка не пишется: иначе
+импортируемый пост пропал бы, а его комментарии достались бы чужому.
+В written считаются только действительно вставленные строки.
+
+bulk_create не отправляет сигналы, поэтому ленты, счётчики и
+поисковый индекс после импорта пересобирает finish(). Кэш общий для
+всех процессов (CACHES), так что его сброс из команды видят и воркеры
+сервера.
+"""
+import csv
+import gzip
+import json
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core import response_cache
+
+from . import counters, search, timeline
+from .cache import bump_generation
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+# Порядок записи пачки: сначала то, на что ссылаются остальные.
+TYPES = ('group', 'user', 'post', 'comment', 'follow')
+REQUIRED = {
+    'group': ('slug', 'title'),
+    'user': ('username',),
+    'post': ('id', 'author', 'text'),
+    'comment': ('id', 'post', 'author', 'text'),
+    'follow': ('user', 'author'),
+}
+NUMBERS = {
+    'post': ('id',),
+    'comment': ('id', 'post'),
+}
+
+
+class RecordError(ValueError):
+    """Запись, которую нельзя импортировать."""
+
+
+def open_text(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def _parse_json(line):
+    try:
+        return json.loads(line)
+    except ValueError as error:
+        return RecordError(f'Неверный JSON: {error}')
+
+
+def read_records(path, record_type=None, file_format=None):
+    """Записи файла по одной: словари с ключом 'type'.
+
+    Нечитаемая строка JSONL отдаётся как RecordError, чтобы её номер
+    совпадал с позицией в файле; Importer.add() её отбросит.
+    """
+    if file_format is None:
+        name = path[:-3] if path.endswith('.gz') else path
+        file_format = 'csv' if name.endswith('.csv') else 'jsonl'
+    with open_text(path) as source:
+        if file_format == 'csv':
+            rows = csv.DictReader(source)
+        else:
+            rows = (_parse_json(line) for line in source if line.strip())
+        for row in rows:
+            if record_type and isinstance(row, dict):
+                row.setdefault('type', record_type)
+            yield row
+
+
+def _date(value):
+    if not value:
+        return timezone.now()
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise RecordError(f'Неверная дата: {value}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+@contextmanager
+def original_dates():
+    """Отключает auto_now и auto_now_add: даты берутся из источника."""
+    fields = [
+        field for model in (Post, Comment)
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Importer:
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.users = {}
+        self.groups = {}
+        self.pending = {record_type: [] for record_type in TYPES}
+        self.size = 0
+        self.written = {record_type: 0 for record_type in TYPES}
+
+    def add(self, record):
+        """Кладёт запись в текущую пачку; True, если пачку пора писать.
+
+        Неполная запись отбрасывается с RecordError, пачка не страдает.
+        """
+        if isinstance(record, RecordError):
+            raise record
+        record_type = record.get('type')
+        if record_type not in self.pending:
+            raise RecordError(f'Неизвестный тип записи: {record_type}')
+        missing = [
+            field for field in REQUIRED[record_type] if not record.get(field)
+        ]
+        if missing:
+            raise RecordError(f'Нет полей: {", ".join(missing)}')
+        for field in NUMBERS.get(record_type, ()):
+            try:
+                record[field] = int(record[field])
+            except (TypeError, ValueError):
+                raise RecordError(f'{field} должно быть числом')
+        if record_type in ('post', 'comment'):
+            record['pub_date'] = _date(record.get('pub_date'))
+        self.pending[record_type].append(record)
+        self.size += 1
+        return self.size >= self.batch_size
+
+    def flush(self):
+        """Пишет накопленную пачку в одной транзакции."""
+        with transaction.atomic():
+            for record_type in TYPES:
+                records = self.pending[record_type]
+                if records:
+                    getattr(self, f'_write_{record_type}s')(records)
+        self.pending = {record_type: [] for record_type in TYPES}
+        self.size = 0
+
+    def _user_ids(self, usernames):
+        missing = set(usernames) - set(self.users)
+        if missing:
+            self.users.update(User.objects.filter(
+                username__in=missing
+            ).values_list('username', 'id'))
+            new = missing - set(self.users)
+            if new:
+                password = make_password(None)
+                User.objects.bulk_create(
+                    [User(username=name, password=password) for name in new],
+                    ignore_conflicts=True
+                )
+                self.users.update(User.objects.filter(
+                    username__in=new
+                ).values_list('username', 'id'))
+        return self.users
+
+    def _group_ids(self, slugs):
+        missing = set(slugs) - set(self.groups)
+        if missing:
+            self.groups.update(Group.objects.filter(
+                slug__in=missing
+            ).values_list('slug', 'id'))
+            unknown = missing - set(self.groups)
+            if unknown:
+                raise RecordError(
+                    f'Неизвестные группы: {", ".join(sorted(unknown))}'
+                )
+        return self.groups
+
+    def _existing(self, name, model, records, fields, expected):
+        """id записей, которые уже есть в базе с теми же значениями.
+
+        expected(record) — значения fields, которые должны быть у строки
+        с id записи; если в базе под этим id другая строка — RecordError
+        с name во множественном числе.
+        """
+        ids = {record['id'] for record in records}
+        rows = {
+            row[0]: tuple(row[1:])
+            for row in model.objects.filter(pk__in=ids).values_list(
+                'id', *fields
+            )
+        }
+        conflicts = sorted({
+            record['id'] for record in records
+            if record['id'] in rows and rows[record['id']] != expected(record)
+        })
+        if conflicts:
+            raise RecordError(
+                f'{name} с id '
+                f'{", ".join(map(str, conflicts[:10]))} уже есть в базе с '
+                f'другими данными; импортируйте в пустую базу или файл '
+                f'без пересечения id'
+            )
+        return set(rows)
+
+    def _write_groups(self, records):
+        slugs = {record['slug'] for record in records}
+        existing = set(Group.objects.filter(
+            slug__in=slugs
+        ).values_list('slug', flat=True))
+        Group.objects.bulk_create([
+            Group(
+                slug=record['slug'],
+                title=record['title'],
+                description=record.get('description') or '',
+            )
+            for record in records
+        ], ignore_conflicts=True)
+        self.written['group'] += len(slugs - existing)
+
+    def _write_users(self, records):
+        usernames = {record['username'] for record in records}
+        existing = set(User.objects.filter(
+            username__in=usernames
+        ).values_list('username', flat=True))
+        password = make_password(None)
+        User.objects.bulk_create([
+            User(
+                username=record['username'],
+                first_name=record.get('first_name') or '',
+                last_name=record.get('last_name') or '',
+                email=record.get('email') or '',
+                password=password,
+            )
+            for record in records
+        ], ignore_conflicts=True)
+        self.written['user'] += len(usernames - existing)
+
+    def _write_posts(self, records):
+        users = self._user_ids(record['author'] for record in records)
+        groups = self._group_ids(
+            record['group'] for record in records if record.get('group')
+        )
+        existing = self._existing(
+            'Посты', Post, records, ('author_id', 'text'),
+            lambda record: (users[record['author']], record['text'])
+        )
+        posts = [
+            Post(
+                id=record['id'],
+                author_id=users[record['author']],
+                group_id=groups.get(record.get('group') or None),
+                text=record['text'],
+                image=record.get('image') or '',
+                pub_date=record['pub_date'],
+                edit_date=record['pub_date'],
+            )
+            for record in records
+        ]
+        Post.objects.bulk_create(posts, ignore_conflicts=True)
+        self.written['post'] += len({post.id for post in posts} - existing)
+
+    def _write_comments(self, records):
+        users = self._user_ids(record['author'] for record in records)
+        existing = self._existing(
+            'Комментарии', Comment, records, ('post_id', 'author_id', 'text'),
+            lambda record: (
+                record['post'], users[record['author']], record['text']
+            )
+        )
+        Comment.objects.bulk_create([
+            Comment(
+                id=record['id'],
+                post_id=record['post'],
+                author_id=users[record['author']],
+                text=record['text'],
+                pub_date=record['pub_date'],
+            )
+            for record in records
+        ], ignore_conflicts=True)
+        self.written['comment'] += len(
+            {record['id'] for record in records} - existing
+        )
+
+    def _write_follows(self, records):
+        users = self._user_ids(
+            name for record in records
+            for name in (record['user'], record['author'])
+        )
+        pairs = {
+            (users[record['user']], users[record['author']])
+            for record in records
+            if record['user'] != record['author']
+        }
+        existing = set(Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs}
+        ).values_list('user_id', 'author_id'))
+        Follow.objects.bulk_create([
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in pairs - existing
+        ], ignore_conflicts=True)
+        self.written['follow'] += len(pairs - existing)
+
+
+def finish():
+    """Пересобирает то, что при обычном сохранении делают сигналы."""
+    with transaction.atomic():
+        timeline.rebuild()
+    counters.recount()
+    if search.is_available():
+        with transaction.atomic():
+            search.rebuild()
+    bump_generation()
+    response_cache.purge(response_cache.ALL)
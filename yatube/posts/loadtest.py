@@ -0,0 +1,379 @@
+"""Нагрузочный прогон WSGI-приложения под конкурентными клиентами.
+
+serve() поднимает yatube.wsgi.application на локальном многопоточном
+сервере, клиенты ходят к нему по HTTP. Каждый поток клиента — отдельный
+пользователь: он выбирает сценарий по весам MIX и повторяет это до
+конца прогона. Анонимный просмотр открывает ленты, группы, профили и
+посты; остальные сценарии выполняются под учётной записью, в которую
+поток входит через форму входа.
+
+Клиенты могут работать в нескольких процессах: сервер и клиенты одного
+процесса делят GIL, и при многих потоках замер упирается в клиентов.
+Ошибки «database is locked» видны только серверу, поэтому сервер считает
+их по сигналу got_request_exception, а клиент помечает свои запросы
+заголовком со сценарием.
+"""
+import bisect
+import multiprocessing
+import random
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import requests
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.servers.basehttp import ThreadedWSGIServer
+from django.core.servers.basehttp import WSGIRequestHandler
+from django.core.signals import got_request_exception
+from django.db import connections
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.sqlite import is_locked
+from users.models import Profile
+
+from .benchmark import percentile
+from .models import Group, Post
+
+User = get_user_model()
+
+MIX = {'browse': 60, 'feed': 20, 'comment': 10, 'follow': 10}
+USERNAME = 'loadtest_{}'
+SCENARIO_HEADER = 'X-Loadtest-Scenario'
+# Сколько постов, групп и авторов берётся из базы для случайных адресов.
+SAMPLE_SIZE = 500
+# Верхние границы корзин гистограммы задержек, мс.
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+LABELS = [f'≤{bound}' for bound in BUCKETS] + [f'>{BUCKETS[-1]}']
+
+
+class Histogram:
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.latencies = []
+
+    def add(self, milliseconds):
+        self.counts[bisect.bisect_left(BUCKETS, milliseconds)] += 1
+        self.latencies.append(milliseconds)
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.latencies.extend(other.latencies)
+
+    def percentile(self, share):
+        if not self.latencies:
+            return 0.0
+        return percentile(self.latencies, share)
+
+
+class Stats:
+    """Запросы, ошибки и задержки по сценариям."""
+
+    def __init__(self):
+        self.requests = Counter()
+        self.errors = Counter()
+        self.locks = Counter()
+        self.histograms = {}
+
+    def add(self, scenario, milliseconds, failed):
+        self.requests[scenario] += 1
+        if failed:
+            self.errors[scenario] += 1
+        self.histograms.setdefault(scenario, Histogram()).add(milliseconds)
+
+    def merge(self, other):
+        self.requests.update(other.requests)
+        self.errors.update(other.errors)
+        self.locks.update(other.locks)
+        for scenario, histogram in other.histograms.items():
+            self.histograms.setdefault(scenario, Histogram()).merge(histogram)
+
+    def total(self):
+        histogram = Histogram()
+        for other in self.histograms.values():
+            histogram.merge(other)
+        return histogram
+
+
+class Targets:
+    """Адреса, которые открывают сценарии: выборка из текущей базы."""
+
+    def __init__(self):
+        self.posts = list(Post.objects.order_by('?').values_list(
+            'pk', flat=True
+        )[:SAMPLE_SIZE])
+        self.groups = list(Group.objects.order_by('?').values_list(
+            'slug', flat=True
+        )[:SAMPLE_SIZE])
+        self.authors = list(Profile.objects.filter(
+            posts_count__gt=0
+        ).order_by('?').values_list('user__username', flat=True)[
+            :SAMPLE_SIZE
+        ])
+        if not self.posts:
+            raise ValueError('В базе нет постов')
+
+
+def prepare_users(count):
+    """Создаёт учётные записи нагрузочных клиентов со свежим паролем."""
+    password = secrets.token_urlsafe()
+    encoded = make_password(password)
+    usernames = [USERNAME.format(number) for number in range(count)]
+    for username in usernames:
+        user, created = User.objects.get_or_create(username=username)
+        user.password = encoded
+        user.save(update_fields=['password'])
+    return usernames, password
+
+
+class LockCounter:
+    """Считает ошибки блокировки SQLite, которые дошли до обработчика."""
+
+    def __init__(self):
+        self.locks = Counter()
+        self.lock = threading.Lock()
+
+    def __call__(self, sender, request=None, **kwargs):
+        error = sys.exc_info()[1]
+        if error is None or not is_locked(error):
+            return
+        scenario = '-'
+        if request is not None:
+            scenario = request.META.get(
+                'HTTP_' + SCENARIO_HEADER.upper().replace('-', '_'), '-'
+            )
+        with self.lock:
+            self.locks[scenario] += 1
+
+
+class QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve(host='127.0.0.1', port=0):
+    """Запускает yatube.wsgi.application в фоне, отдаёт (адрес, LockCounter).
+
+    DEBUG выключается: иначе каждый запрос пишется в connection.queries,
+    а для 127.0.0.1 ещё и строится панель отладки.
+    """
+    from yatube.wsgi import application
+
+    counter = LockCounter()
+    got_request_exception.connect(counter, weak=False)
+    # Потокам сервера нужны свои соединения, а не унаследованные.
+    connections.close_all()
+    with override_settings(DEBUG=False):
+        server = ThreadedWSGIServer((host, port), QuietHandler)
+        server.set_app(application)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield f'http://{host}:{server.server_port}', counter
+        finally:
+            server.shutdown()
+            server.server_close()
+            got_request_exception.disconnect(counter)
+
+
+class Client:
+    """Один пользователь нагрузки: свой Session, свой генератор сценариев.
+    """
+
+    def __init__(self, base_url, targets, stats, rnd, username=None,
+                 password=None, timeout=30):
+        self.base_url = base_url
+        self.targets = targets
+        self.stats = stats
+        self.random = rnd
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.anonymous = requests.Session()
+        self.session = requests.Session()
+
+    def request(self, scenario, session, method, path, data=None):
+        started = time.perf_counter()
+        try:
+            response = session.request(
+                method, self.base_url + path, data=data,
+                headers={SCENARIO_HEADER: scenario},
+                allow_redirects=False, timeout=self.timeout,
+            )
+            failed = response.status_code >= 400
+        except requests.RequestException:
+            failed = True
+        self.stats.add(
+            scenario, (time.perf_counter() - started) * 1000, failed
+        )
+        return not failed
+
+    def login(self):
+        path = reverse('users:login')
+        self.session.get(self.base_url + path, timeout=self.timeout)
+        response = self.session.post(self.base_url + path, data={
+            'username': self.username,
+            'password': self.password,
+            'csrfmiddlewaretoken': self.session.cookies.get('csrftoken'),
+        }, allow_redirects=False, timeout=self.timeout)
+        if 'sessionid' not in self.session.cookies:
+            raise RuntimeError(
+                f'{self.username}: вход не удался ({response.status_code})'
+            )
+
+    def browse(self):
+        choice = self.random.random()
+        if choice < 0.3 or not (self.targets.groups and self.targets.authors):
+            page = self.random.randint(1, 5)
+            path = f'{reverse("posts:index")}?page={page}'
+        elif choice < 0.5:
+            path = reverse('posts:group_posts', args=[
+                self.random.choice(self.targets.groups)
+            ])
+        elif choice < 0.7:
+            path = reverse('posts:profile', args=[
+                self.random.choice(self.targets.authors)
+            ])
+        else:
+            path = reverse('posts:post_detail', args=[
+                self.random.choice(self.targets.posts)
+            ])
+        self.request('browse', self.anonymous, 'get', path)
+
+    def feed(self):
+        self.request(
+            'feed', self.session, 'get', reverse('posts:follow_index')
+        )
+
+    def comment(self):
+        post = self.random.choice(self.targets.posts)
+        if self.request('comment', self.session, 'get',
+                        reverse('posts:post_detail', args=[post])):
+            self.request(
+                'comment', self.session, 'post',
+                reverse('posts:add_comment', args=[post]),
+                {
+                    'text': 'Комментарий нагрузочного прогона',
+                    'csrfmiddlewaretoken':
+                        self.session.cookies.get('csrftoken'),
+                },
+            )
+
+    def follow(self):
+        if not self.targets.authors:
+            self.feed()
+            return
+        author = self.random.choice(self.targets.authors)
+        view = self.random.choice(('profile_follow', 'profile_unfollow'))
+        self.request(
+            'follow', self.session, 'get',
+            reverse(f'posts:{view}', args=[author])
+        )
+
+    def run(self, mix, deadline):
+        scenarios = list(mix)
+        weights = [mix[name] for name in scenarios]
+        while time.monotonic() < deadline:
+            getattr(self, self.random.choices(scenarios, weights)[0])()
+
+
+def _run_client(base_url, targets, stats, mix, deadline, seed, number,
+                credentials):
+    username, password = credentials or (None, None)
+    client = Client(
+        base_url, targets, stats, random.Random(f'{seed}:{number}'),
+        username, password
+    )
+    if username is not None:
+        try:
+            client.login()
+        except (RuntimeError, requests.RequestException):
+            stats.add('login', 0.0, True)
+            return
+    client.run(mix, deadline)
+
+
+def run_threads(base_url, targets, mix, duration, threads, seed=0,
+                first=0, users=None, password=None):
+    """Прогон в текущем процессе; first — номер первого клиента."""
+    deadline = time.monotonic() + duration
+    results = []
+    workers = []
+    for number in range(first, first + threads):
+        stats = Stats()
+        results.append(stats)
+        credentials = None
+        if users:
+            credentials = (users[number], password)
+        workers.append(threading.Thread(
+            target=_run_client,
+            args=(base_url, targets, stats, mix, deadline, seed, number,
+                  credentials),
+        ))
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    total = Stats()
+    for stats in results:
+        total.merge(stats)
+    return total
+
+
+def _run_process(arguments):
+    return run_threads(*arguments)
+
+
+def run(base_url, mix=None, duration=30, threads=4, processes=1, seed=0,
+        users=None, password=None, targets=None):
+    """Прогон threads × processes клиентов; возвращает (Stats, секунды).
+
+    users — имена учётных записей по одной на клиента, без них
+    выполняется только анонимный просмотр.
+    """
+    mix = dict(mix or MIX)
+    if not users:
+        mix = {'browse': mix.get('browse') or 1}
+    targets = targets or Targets()
+    arguments = [
+        (base_url, targets, mix, duration, threads, seed,
+         process * threads, users, password)
+        for process in range(processes)
+    ]
+    started = time.monotonic()
+    if processes == 1:
+        stats = run_threads(*arguments[0])
+    else:
+        stats = Stats()
+        # Клиентам база не нужна; процессы не наследуют соединения.
+        connections.close_all()
+        with multiprocessing.Pool(processes) as pool:
+            for result in pool.map(_run_process, arguments):
+                stats.merge(result)
+    return stats, time.monotonic() - started
+
+
+def parse_mix(value):
+    """«browse=60,feed=20» → {'browse': 60, 'feed': 20}."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in MIX:
+            raise ValueError(f'Неизвестный сценарий: {name}')
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise ValueError(f'Вес сценария {name} должен быть числом')
+        if mix[name] < 0:
+            raise ValueError(f'Вес сценария {name} отрицательный')
+    if not any(mix.values()):
+        raise ValueError('Нужен хотя бы один сценарий с ненулевым весом')
+    return mix
@@ -0,0 +1,92 @@
+import json
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts import benchmark
+
+# Набор данных для замеров: тот же seed — те же данные на любой машине.
+DATASET = {
+    'users': 2000, 'groups': 20, 'posts': 20000, 'comments': 40000,
+    'follows': 20, 'seed': 0,
+}
+COLUMNS = ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'sql_ms', 'bytes')
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время, число запросов и размер ответа лент, профиля, '
+        'поста и создания поста и сравнивает их с эталоном'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--baseline', default=settings.BENCHMARK_BASELINE,
+            help='JSON-файл эталона'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help='Допустимый рост p95 и размера ответа, доля от эталона'
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Записать результат в файл эталона вместо сравнения'
+        )
+        parser.add_argument(
+            '--current-db', action='store_true',
+            help='Мерить на текущей базе, а не на временной с seed_scale'
+        )
+
+    def handle(self, *args, **options):
+        if options['current_db']:
+            results = self.run(options)
+        else:
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                self.stdout.write('Заполнение временной базы...')
+                call_command('seed_scale', stdout=StringIO(), **DATASET)
+                results = self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        if options['save_baseline']:
+            with open(options['baseline'], 'w', encoding='utf-8') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+                output.write('\n')
+            self.stdout.write(self.style.SUCCESS(
+                f'Эталон записан в {options["baseline"]}'
+            ))
+            return
+        try:
+            with open(options['baseline'], encoding='utf-8') as source:
+                baseline = json.load(source)
+        except FileNotFoundError:
+            raise CommandError(
+                f'Нет эталона {options["baseline"]}; '
+                f'создайте его с --save-baseline'
+            )
+        regressions = benchmark.compare(
+            results, baseline, options['threshold']
+        )
+        if regressions:
+            raise CommandError(
+                'Регрессии производительности:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def run(self, options):
+        results = benchmark.run(options['requests'], options['warmup'])
+        self.stdout.write(
+            f'{"":<14}' + ''.join(f'{column:>10}' for column in COLUMNS)
+        )
+        for name, metrics in results.items():
+            self.stdout.write(f'{name:<14}' + ''.join(
+                f'{metrics[column]:>10}' for column in COLUMNS
+            ))
+        return results
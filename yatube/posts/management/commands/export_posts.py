@@ -0,0 +1,48 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты автора в JSONL или CSV, потоково'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Автор постов')
+        parser.add_argument(
+            '--format', choices=tuple(export.FORMATS), default='jsonl',
+            help='Формат выгрузки'
+        )
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл выгрузки; по умолчанию — стандартный вывод'
+        )
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Сжимать выгрузку gzip'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден'
+            )
+        chunks = export.stream(author, options['format'], options['gzip'])
+        if options['output'] == '-':
+            output = sys.stdout.buffer
+            for chunk in chunks:
+                output.write(chunk)
+            output.flush()
+            return
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
+        self.stderr.write(
+            self.style.SUCCESS(f'Посты выгружены в {options["output"]}')
+        )
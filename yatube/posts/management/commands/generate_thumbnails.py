@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import SIZES, generate_post
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие миниатюры картинок всех постов'
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only('pk', 'image')
+        done = 0
+        for post in posts.iterator():
+            try:
+                generate_post(post)
+            except Exception as error:
+                self.stderr.write(f'Пост {post.pk}: {error}')
+                continue
+            done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры ({len(SIZES)} вариантов) готовы для {done} постов'
+        ))
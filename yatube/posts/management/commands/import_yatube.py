@@ -0,0 +1,124 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from posts import importer
+
+
+class Checkpoint:
+    """Сколько записей файла уже записано в базу; хранится рядом с ним."""
+
+    def __init__(self, path, checkpoint_path=None):
+        self.source = path
+        self.path = checkpoint_path or f'{path}.checkpoint'
+        self.size = os.path.getsize(path)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, encoding='utf-8') as state_file:
+            state = json.load(state_file)
+        if state['size'] != self.size:
+            raise CommandError(
+                f'{self.source} изменился после прерванного импорта; '
+                f'запустите с --restart'
+            )
+        return state['position']
+
+    def save(self, position):
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as state_file:
+            json.dump({'size': self.size, 'position': position}, state_file)
+        os.replace(temporary, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует группы, пользователей, посты, комментарии и подписки '
+        'из JSONL или CSV'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Файлы .jsonl/.csv(.gz)')
+        parser.add_argument(
+            '--type', choices=importer.TYPES,
+            help='Тип записей, если его нет в самих записях (для CSV)'
+        )
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'),
+            help='Формат файлов; по умолчанию — по расширению'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=importer.BATCH_SIZE,
+            help='Сколько записей писать в одной транзакции'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать заново, не продолжая прерванный импорт'
+        )
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Не пересобирать ленты, счётчики и поиск после импорта'
+        )
+
+    def handle(self, *args, **options):
+        self.importer = importer.Importer(options['batch_size'])
+        checkpoints = []
+        with importer.original_dates():
+            for path in options['paths']:
+                checkpoint = Checkpoint(path)
+                if options['restart']:
+                    checkpoint.remove()
+                self.import_file(path, checkpoint, options)
+                checkpoints.append(checkpoint)
+        for record_type, count in self.importer.written.items():
+            self.stdout.write(f'{record_type}: {count}')
+        if not options['no_rebuild']:
+            self.stdout.write('Пересборка лент, счётчиков и поиска...')
+            importer.finish()
+        for checkpoint in checkpoints:
+            checkpoint.remove()
+        self.stdout.write(self.style.SUCCESS('Импорт завершён'))
+
+    def import_file(self, path, checkpoint, options):
+        resume_from = checkpoint.load()
+        if resume_from:
+            self.stdout.write(f'{path}: продолжение с записи {resume_from}')
+        records = importer.read_records(
+            path, options['type'], options['format']
+        )
+        position = 0
+        started = time.monotonic()
+        for position, record in enumerate(records, start=1):
+            if position <= resume_from:
+                continue
+            try:
+                full = self.importer.add(record)
+            except importer.RecordError as error:
+                self.stderr.write(f'{path}:{position}: {error}')
+                continue
+            if full:
+                self.flush(path, checkpoint, position, resume_from, started)
+        self.flush(path, checkpoint, position, resume_from, started)
+
+    def flush(self, path, checkpoint, position, resume_from, started):
+        try:
+            self.importer.flush()
+        except (importer.RecordError, IntegrityError) as error:
+            raise CommandError(
+                f'{path}: {error}. Записанные пачки сохранены, после '
+                f'исправления импорт продолжится с места остановки'
+            )
+        checkpoint.save(position)
+        done = position - resume_from
+        rate = done / max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'{path}: {position} записей, {rate:.0f} записей/с'
+        )
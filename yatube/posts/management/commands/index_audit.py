@@ -0,0 +1,137 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLResolver, get_resolver, reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+# Пространства имён URL, представления которых проверяются.
+NAMESPACES = ('posts', 'api')
+# Строки плана, в которых таблица читается по индексу.
+INDEXED = ('USING INDEX', 'USING COVERING INDEX', 'USING INTEGER PRIMARY KEY',
+           'USING ROWID', 'VIRTUAL TABLE INDEX')
+
+
+# Без кэша: видны все запросы страниц, а кэш сайта не трогается.
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+def analyze(sql, plan, tables):
+    """Полные просмотры таблиц и сортировки без индекса из плана запроса.
+
+    Просмотр всей таблицы — проблема, только если у запроса есть WHERE:
+    без условия читать всё и нужно.
+    """
+    scans, sorts = [], []
+    for row in plan:
+        detail = row[-1]
+        words = detail.split()
+        if (words[0] == 'SCAN' and words[1] in tables
+                and not any(marker in detail for marker in INDEXED)
+                and ' WHERE ' in sql):
+            scans.append(detail)
+        elif detail.startswith('USE TEMP B-TREE'):
+            sorts.append(detail)
+    return scans, sorts
+
+
+def view_names(namespaces=NAMESPACES):
+    """(имя URL, имена параметров) всех маршрутов пространств имён."""
+    for resolver in get_resolver().url_patterns:
+        if not isinstance(resolver, URLResolver):
+            continue
+        if resolver.namespace not in namespaces:
+            continue
+        for pattern in resolver.url_patterns:
+            if pattern.name:
+                yield (
+                    f'{resolver.namespace}:{pattern.name}',
+                    tuple(pattern.pattern.converters)
+                )
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет GET-запрос к каждому представлению на данных базы и '
+        'показывает запросы, для которых EXPLAIN QUERY PLAN сообщает '
+        'полный просмотр таблицы (!) или сортировку без индекса (~)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Завершиться ошибкой, если найден хотя бы один просмотр'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('index_audit умеет читать только планы SQLite')
+        post = Post.objects.select_related('author', 'group').exclude(
+            group=None
+        ).order_by('-pk').first()
+        if post is None:
+            raise CommandError('Нужен хотя бы один пост в группе')
+        samples = {
+            'username': post.author.username,
+            'slug': post.group.slug,
+            'post_id': post.pk,
+        }
+        client = Client(REMOTE_ADDR='192.0.2.1')
+        problems = 0
+        # GET-представления вроде profile_follow пишут в базу, вход
+        # создаёт сессию и меняет last_login — всё это откатываем.
+        try:
+            with override_settings(CACHES=NO_CACHE), transaction.atomic():
+                client.force_login(post.author)
+                for name, params in view_names():
+                    problems += self.audit(client, name, params, samples)
+                raise Rollback
+        except Rollback:
+            pass
+        if problems and options['strict']:
+            raise CommandError(f'Запросов с полным просмотром: {problems}')
+        self.stdout.write(f'Запросов с полным просмотром: {problems}')
+
+    def audit(self, client, name, params, samples):
+        url = reverse(name, kwargs={param: samples[param] for param in params})
+        with CaptureQueriesContext(connection) as context:
+            try:
+                response = client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            except Exception as error:
+                self.stderr.write(f'{name} {url}: {error!r}')
+        selects = dict.fromkeys(
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+        )
+        tables = set(connection.introspection.table_names())
+        problems = 0
+        lines = []
+        with connection.cursor() as cursor:
+            for sql in selects:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                scans, sorts = analyze(sql, cursor.fetchall(), tables)
+                if scans or sorts:
+                    lines.append(f'    {sql}')
+                    lines.extend(f'      ! {scan}' for scan in scans)
+                    lines.extend(f'      ~ {sort}' for sort in sorts)
+                problems += bool(scans)
+        style = self.style.WARNING if problems else self.style.SUCCESS
+        self.stdout.write(style(
+            f'{name} {url}: {len(context.captured_queries)} запросов, '
+            f'с полным просмотром {problems}'
+        ))
+        for line in lines:
+            self.stdout.write(line)
+        return problems
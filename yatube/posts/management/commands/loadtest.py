@@ -0,0 +1,112 @@
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import loadtest
+
+
+@contextmanager
+def _external(url):
+    yield url.rstrip('/'), None
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает WSGI-приложение конкурентными клиентами и печатает '
+        'пропускную способность, ошибки и гистограммы задержек'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--duration', type=float, default=30,
+            help='Длительность прогона в секундах'
+        )
+        parser.add_argument(
+            '--threads', type=int, default=4,
+            help='Клиентов-потоков в каждом процессе'
+        )
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Процессов с клиентами'
+        )
+        parser.add_argument(
+            '--mix', default=','.join(
+                f'{name}={weight}' for name, weight in loadtest.MIX.items()
+            ),
+            help='Веса сценариев browse, feed, comment и follow'
+        )
+        parser.add_argument(
+            '--url',
+            help='Нагружать уже запущенный сервер вместо локального'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        threads, processes = options['threads'], options['processes']
+        if threads < 1 or processes < 1:
+            raise CommandError('Нужен хотя бы один поток и один процесс')
+        try:
+            mix = loadtest.parse_mix(options['mix'])
+            targets = loadtest.Targets()
+        except ValueError as error:
+            raise CommandError(error)
+        users = password = None
+        if set(mix) - {'browse'}:
+            users, password = loadtest.prepare_users(threads * processes)
+        server = (
+            _external(options['url']) if options['url']
+            else loadtest.serve()
+        )
+        with server as (base_url, counter):
+            self.stdout.write(
+                f'{base_url}: процессов {processes}, потоков в каждом '
+                f'{threads}, {options["duration"]:g} с'
+            )
+            stats, elapsed = loadtest.run(
+                base_url, mix, options['duration'], threads, processes,
+                options['seed'], users, password, targets
+            )
+        if counter is not None:
+            stats.locks.update(counter.locks)
+        self.report(stats, elapsed, counter is not None)
+
+    def report(self, stats, elapsed, locks_known):
+        total = stats.total()
+        requests = sum(stats.requests.values())
+        errors = sum(stats.errors.values())
+        self.stdout.write(
+            f'Запросов {requests}, {requests / elapsed:.1f} в секунду, '
+            f'ошибок {errors} ({errors / max(requests, 1):.2%})'
+        )
+        if locks_known:
+            self.stdout.write(
+                f'Ошибок блокировки SQLite: {sum(stats.locks.values())}'
+            )
+        header = (
+            f'{"":<10}{"запросов":>10}{"ошибок":>8}{"блок.":>7}'
+            f'{"p50_ms":>9}{"p95_ms":>9}{"p99_ms":>9}'
+        )
+        self.stdout.write(header)
+        rows = sorted(stats.histograms.items()) + [('всего', total)]
+        for name, histogram in rows:
+            if name == 'всего':
+                count, failed = requests, errors
+                locked = sum(stats.locks.values())
+            else:
+                count, failed = stats.requests[name], stats.errors[name]
+                locked = stats.locks[name]
+            self.stdout.write(
+                f'{name:<10}{count:>10}{failed:>8}'
+                f'{locked if locks_known else "-":>7}'
+                f'{histogram.percentile(0.5):>9.1f}'
+                f'{histogram.percentile(0.95):>9.1f}'
+                f'{histogram.percentile(0.99):>9.1f}'
+            )
+        self.stdout.write('Гистограмма задержек, мс:')
+        self.stdout.write(f'{"":<10}' + ''.join(
+            f'{label:>7}' for label in loadtest.LABELS
+        ))
+        for name, histogram in rows:
+            self.stdout.write(f'{name:<10}' + ''.join(
+                f'{count:>7}' for count in histogram.counts
+            ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters, tasks
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=counters.BATCH_SIZE,
+            help='Сколько строк пересчитывать в одной транзакции'
+        )
+        parser.add_argument(
+            '--queue', action='store_true',
+            help='Поставить пересчёт в очередь фоновых задач'
+        )
+
+    def handle(self, *args, **options):
+        if options['queue']:
+            job = tasks.recount.delay(batch_size=options['batch_size'])
+            self.stdout.write(
+                self.style.SUCCESS(f'Поставлено в очередь: {job}')
+            )
+            return
+        repaired = counters.recount(options['batch_size'])
+        for name, count in repaired.items():
+            self.stdout.write(f'{name}: исправлено {count}')
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+from posts.seeding import Dataset
+
+REPORT_EVERY = 100000
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами, '
+        'комментариями и подписками для нагрузочных проверок'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=300000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок пользователя'
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степенного закона популярности авторов'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Один seed — одни и те же данные'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Сколько записей писать в одной транзакции'
+        )
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Не пересобирать ленты, счётчики и поиск'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь')
+        dataset = Dataset(
+            options['users'], options['groups'], options['posts'],
+            options['comments'], options['follows'], options['seed'],
+            options['alpha']
+        )
+        writer = importer.Importer(options['batch_size'])
+        started = time.monotonic()
+        reported = 0
+        with importer.original_dates():
+            for position, record in enumerate(dataset.generate(), start=1):
+                if writer.add(record):
+                    writer.flush()
+                    if position - reported >= REPORT_EVERY:
+                        reported = position
+                        rate = position / (time.monotonic() - started)
+                        self.stdout.write(
+                            f'{position} записей, {rate:.0f} записей/с'
+                        )
+            writer.flush()
+        for record_type, count in writer.written.items():
+            self.stdout.write(f'{record_type}: {count}')
+        if not options['no_rebuild']:
+            self.stdout.write('Пересборка лент, счётчиков и поиска...')
+            importer.finish()
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.0f} с'
+        ))
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+CREATE = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS posts_search USING fts5('
+    'body, post_id UNINDEXED, tokenize="unicode61 remove_diacritics 2")'
+)
+DROP = 'DROP TABLE IF EXISTS posts_search'
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(CREATE)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_edit_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
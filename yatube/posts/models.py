@@ -2,6 +2,8 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from core.models import CreatedModel
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -9,6 +11,7 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField('Постов', default=0)
 
     def __str__(self):
         return self.title
@@ -37,12 +40,34 @@ class Post(CreatedModel):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True
+        storage=ContentAddressedStorage(),
+        blank=True,
+        db_index=True
     )
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+    edit_date = models.DateTimeField('Дата изменения', auto_now=True)
 
     class Meta:
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='posts_post_author_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='posts_post_group_date_idx'
+            ),
+            models.Index(
+                fields=['author', 'edit_date'],
+                name='posts_post_author_edit_idx'
+            ),
+            models.Index(
+                fields=['group', 'edit_date'],
+                name='posts_post_group_edit_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -63,6 +88,14 @@ class Comment(CreatedModel):
         help_text='Введите текст комментария'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'pub_date'],
+                name='posts_comment_post_date_idx'
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -75,3 +108,35 @@ class Follow(models.Model):
         related_name='following',
         on_delete=models.CASCADE,
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='posts_follow_unique'
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Запись ленты подписок: пост автора, на которого подписан user."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date'],
+                name='posts_timeline_user_date_idx'
+            ),
+        ]
@@ -0,0 +1,180 @@
+"""Полнотекстовый поиск по постам и комментариям на SQLite FTS5.
+
+В виртуальной таблице posts_search хранится текст, приведённый
+стеммером к основам слов, поэтому запрос «постами» находит «пост».
+rowid строки однозначно задаёт источник (чётный — пост, нечётный —
+комментарий), так что обновление индекса — это удаление по rowid и
+вставка без сканирования таблицы. Индекс поддерживается сигналами;
+на других СУБД поиск откатывается к icontains.
+"""
+import re
+from functools import lru_cache
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from core.stemmer import stem
+
+from .models import Comment, Post
+
+TABLE = 'posts_search'
+WORD = re.compile(r'\w+')
+BATCH_SIZE = 500
+# Словарь живого текста невелик, поэтому основы слов дешевле запомнить,
+# чем вычислять заново: пересборка индекса ускоряется в разы.
+STEM_CACHE_SIZE = 100000
+
+_stem = lru_cache(maxsize=STEM_CACHE_SIZE)(stem)
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def normalize(text):
+    return ' '.join(_stem(word) for word in WORD.findall(text))
+
+
+def build_match(query):
+    """FTS5-запрос: все слова запроса, каждое как префикс основы."""
+    return ' '.join(
+        '"%s"*' % stem(word) for word in WORD.findall(query)
+    )
+
+
+def _post_rowid(post_id):
+    return post_id * 2
+
+
+def _comment_rowid(comment_id):
+    return comment_id * 2 + 1
+
+
+def _insert(rows):
+    """rows — кортежи (rowid, текст, post_id)."""
+    if not rows:
+        return
+    rows = [
+        (rowid, normalize(text), post_id) for rowid, text, post_id in rows
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, body, post_id) VALUES (%s, %s, %s)',
+            rows
+        )
+
+
+def _replace(rows):
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {TABLE} WHERE rowid = %s',
+            [(rowid,) for rowid, *_ in rows]
+        )
+    _insert(rows)
+
+
+def _delete(rowid):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [rowid])
+
+
+def index_post(post):
+    if is_available():
+        _replace([(_post_rowid(post.pk), post.text, post.pk)])
+
+
+def unindex_post(post):
+    if is_available():
+        _delete(_post_rowid(post.pk))
+
+
+def index_comment(comment):
+    if is_available():
+        _replace([
+            (_comment_rowid(comment.pk), comment.text, comment.post_id)
+        ])
+
+
+def unindex_comment(comment):
+    if is_available():
+        _delete(_comment_rowid(comment.pk))
+
+
+def rebuild():
+    """Заполняет индекс заново по всем постам и комментариям."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+    sources = (
+        (Post.objects.values_list('pk', 'text', 'pk'), _post_rowid),
+        (Comment.objects.values_list('pk', 'text', 'post_id'),
+         _comment_rowid),
+    )
+    for queryset, rowid in sources:
+        rows = []
+        for pk, text, post_id in queryset.iterator(chunk_size=BATCH_SIZE):
+            rows.append((rowid(pk), text, post_id))
+            if len(rows) >= BATCH_SIZE:
+                _insert(rows)
+                rows = []
+        _insert(rows)
+
+
+def matching_post_ids(match):
+    """Подзапрос id постов для Post.objects.filter(pk__in=...)."""
+    return RawSQL(
+        f'SELECT post_id FROM {TABLE} WHERE {TABLE} MATCH %s', (match,)
+    )
+
+
+class SearchResults:
+    """Результаты поиска, упорядоченные по релевантности (bm25).
+
+    Поддерживает len() и срезы, поэтому подходит для Paginator:
+    страница — один запрос к FTS-индексу и один к posts_post.
+    """
+
+    def __init__(self, match):
+        self.match = match
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT COUNT(DISTINCT post_id) FROM {TABLE} '
+                    f'WHERE {TABLE} MATCH %s', [self.match]
+                )
+                self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        limit = (index.stop if index.stop is not None else self.count())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT post_id FROM {TABLE} WHERE {TABLE} MATCH %s '
+                f'GROUP BY post_id ORDER BY MIN(rank) LIMIT %s OFFSET %s',
+                [self.match, max(limit - start, 0), start]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search_posts(query):
+    """Посты, в тексте которых или в комментариях есть слова query."""
+    if not WORD.search(query):
+        return Post.objects.none()
+    if is_available():
+        return SearchResults(build_match(query))
+    return Post.objects.filter(
+        Q(text__icontains=query) | Q(comments__text__icontains=query)
+    ).select_related('author', 'group').distinct().order_by('-pub_date')
@@ -0,0 +1,158 @@
+"""Синтетические данные для проверки производительности на объёмах.
+
+generate() отдаёт записи в формате import_yatube: группы, пользователей,
+посты, комментарии и подписки. Авторы выбираются по степенному закону
+(закон Ципфа): пользователь с рангом r пишет и набирает подписчиков
+пропорционально 1 / r ** alpha, так что несколько авторов пишут много,
+а большинство — почти ничего, как в настоящей соцсети. Комментарии так
+же тяготеют к популярным постам. Весь результат определяется seed, даты
+отсчитываются от EPOCH. id постов и комментариев продолжают уже
+существующие в базе, поэтому совпадают между запусками только на пустой
+базе, а в общем случае одинаковы лишь относительно первого id.
+"""
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from django.utils import timezone
+from faker import Faker
+
+from .models import Comment, Post
+
+# Сколько имён и слов Faker создаёт заранее: генерация каждого текста
+# через Faker заняла бы часы на миллионах строк.
+NAMES = 1000
+WORDS = 5000
+SPAN = timedelta(days=2 * 365)
+# Дата последнего поста: от текущего времени даты менялись бы при каждом
+# запуске с тем же seed.
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def zipf_weights(count, alpha):
+    """Накопленные веса рангов 1..count для random.choices(cum_weights=)."""
+    return list(accumulate(1 / rank ** alpha for rank in range(1, count + 1)))
+
+
+class Dataset:
+
+    def __init__(self, users, groups, posts, comments, follows, seed=0,
+                 alpha=1.1):
+        self.users = users
+        self.groups = groups
+        self.posts = posts
+        self.comments = comments
+        self.follows = follows
+        self.seed = seed
+        self.alpha = alpha
+        self.random = random.Random(seed)
+        fake = Faker('ru_RU')
+        fake.seed_instance(seed)
+        self.first_names = [fake.first_name() for _ in range(NAMES)]
+        self.last_names = [fake.last_name() for _ in range(NAMES)]
+        self.words = fake.words(WORDS)
+        self.titles = [fake.catch_phrase() for _ in range(max(groups, 1))]
+
+    def username(self, number):
+        return f'seed{self.seed}_{number}'
+
+    def text(self, low, high):
+        count = self.random.randint(low, high)
+        words = self.random.choices(self.words, k=count)
+        return ' '.join(words).capitalize()
+
+    def generate(self):
+        """Записи в порядке, в котором на них ссылаются остальные."""
+        yield from self._groups()
+        yield from self._users()
+        yield from self._posts()
+        yield from self._comments()
+        yield from self._follows()
+
+    def _groups(self):
+        for number in range(self.groups):
+            yield {
+                'type': 'group',
+                'slug': f'seed{self.seed}-{number}',
+                'title': self.titles[number],
+                'description': self.text(5, 30),
+            }
+
+    def _users(self):
+        for number in range(self.users):
+            yield {
+                'type': 'user',
+                'username': self.username(number),
+                'first_name': self.random.choice(self.first_names),
+                'last_name': self.random.choice(self.last_names),
+            }
+
+    def _posts(self):
+        # id продолжают существующие, даты равномерно растут вместе с id
+        # и заканчиваются в EPOCH.
+        self.first_post = (Post.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0) + 1
+        self.finished = EPOCH
+        self.started = self.finished - SPAN
+        step = SPAN / max(self.posts, 1)
+        authors = zipf_weights(self.users, self.alpha)
+        for number in range(self.posts):
+            author = self.random.choices(
+                range(self.users), cum_weights=authors
+            )[0]
+            group = ''
+            if self.groups and self.random.random() < 0.7:
+                group = f'seed{self.seed}-{self.random.randrange(self.groups)}'
+            yield {
+                'type': 'post',
+                'id': self.first_post + number,
+                'author': self.username(author),
+                'group': group,
+                'text': self.text(5, 120),
+                'pub_date': (self.started + step * number).isoformat(),
+            }
+
+    def _comments(self):
+        if not self.posts:
+            return
+        first_comment = (Comment.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0) + 1
+        step = SPAN / self.posts
+        # Популярность поста не зависит от его номера: ранги перемешаны.
+        ranking = list(range(self.posts))
+        self.random.shuffle(ranking)
+        popular = zipf_weights(self.posts, self.alpha)
+        for number in range(self.comments):
+            rank = self.random.choices(ranking, cum_weights=popular)[0]
+            yield {
+                'type': 'comment',
+                'id': first_comment + number,
+                'post': self.first_post + rank,
+                'author': self.username(self.random.randrange(self.users)),
+                'text': self.text(2, 40),
+                'pub_date': min(
+                    self.started + step * rank
+                    + timedelta(minutes=self.random.randint(1, 60 * 24)),
+                    self.finished
+                ).isoformat(),
+            }
+
+    def _follows(self):
+        # Порядок популярности у подписчиков свой: если бы самые пишущие
+        # авторы были и самыми читаемыми, ленты подписок росли бы как
+        # произведение двух хвостов и не помещались бы ни в какие минуты.
+        ranking = list(range(self.users))
+        self.random.shuffle(ranking)
+        authors = zipf_weights(self.users, self.alpha)
+        for number in range(self.users):
+            count = self.random.randint(0, 2 * self.follows)
+            for author in self.random.choices(
+                ranking, cum_weights=authors, k=count
+            ):
+                yield {
+                    'type': 'follow',
+                    'user': self.username(number),
+                    'author': self.username(author),
+                }
@@ -0,0 +1,186 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import response_cache
+
+from . import counters, search, tasks, timeline
+from .cache import bump_generation, surrogate_keys
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def _after_commit(func, *args):
+    # Сброс до фиксации транзакции открывает окно, в котором анонимный
+    # запрос кэширует ещё старую страницу под новыми версиями ключей.
+    transaction.on_commit(lambda: func(*args))
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_state(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    instance._old_group_id, instance._old_image = Post.objects.filter(
+        pk=instance.pk
+    ).values_list('group_id', 'image').first() or (None, '')
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.post_added(instance)
+        timeline.fan_out(instance)
+        return
+    old_group_id = getattr(instance, '_old_group_id', instance.group_id)
+    if old_group_id != instance.group_id:
+        counters.post_moved(old_group_id, instance.group_id)
+
+
+@receiver(post_delete, sender=Post)
+def post_removed(sender, instance, **kwargs):
+    counters.post_added(instance, delta=-1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.comment_added(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_removed(sender, instance, **kwargs):
+    counters.comment_added(instance, delta=-1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.follow_added(instance)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_trim(sender, instance, **kwargs):
+    counters.follow_added(instance, delta=-1)
+    timeline.trim(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=User)
+def invalidate_listings(sender, **kwargs):
+    _after_commit(bump_generation)
+
+
+@receiver(post_save, sender=User)
+def invalidate_listings_on_user_change(sender, update_fields=None, **kwargs):
+    # Вход пользователя обновляет только last_login — ленты не меняются.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    _after_commit(bump_generation)
+
+
+def _purge_post(post, group_ids):
+    slugs = Group.objects.filter(
+        pk__in=[pk for pk in group_ids if pk]
+    ).values_list('slug', flat=True)
+    _after_commit(
+        response_cache.purge, 'index', *surrogate_keys(post, slugs)
+    )
+
+
+@receiver(post_save, sender=Post)
+def purge_saved_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        old_group_id = getattr(instance, '_old_group_id', None)
+        _purge_post(instance, {old_group_id, instance.group_id})
+
+
+@receiver(post_delete, sender=Post)
+def purge_deleted_post(sender, instance, **kwargs):
+    _purge_post(instance, {instance.group_id})
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def purge_comment_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _after_commit(response_cache.purge, f'post:{instance.post_id}')
+
+
+@receiver(pre_save, sender=Group)
+def group_remember_slug(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    instance._old_slug = Group.objects.filter(
+        pk=instance.pk
+    ).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def purge_group(sender, instance, raw=False, **kwargs):
+    if not raw:
+        old_slug = getattr(instance, '_old_slug', None) or instance.slug
+        _after_commit(
+            response_cache.purge,
+            'index', f'group:{instance.slug}', f'group:{old_slug}'
+        )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def purge_user(sender, update_fields=None, raw=False, **kwargs):
+    # Имена авторов есть почти на всех страницах, поэтому сбрасываем всё;
+    # вход пользователя (last_login) страниц не меняет.
+    if raw or update_fields and set(update_fields) <= {'last_login'}:
+        return
+    _after_commit(response_cache.purge, response_cache.ALL)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.unindex_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.unindex_comment(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_release_old_image(sender, instance, created, raw=False, **kwargs):
+    old_image = getattr(instance, '_old_image', '')
+    if created or raw or old_image == instance.image.name:
+        return
+    tasks.release_image.delay_by(
+        settings.POSTS_IMAGE_RELEASE_DELAY, name=old_image
+    )
+
+
+@receiver(post_delete, sender=Post)
+def post_release_image(sender, instance, **kwargs):
+    image = instance.image.name
+    if image:
+        tasks.release_image.delay_by(
+            settings.POSTS_IMAGE_RELEASE_DELAY, name=image
+        )
@@ -0,0 +1,92 @@
+"""Хранилище картинок постов с адресацией по содержимому.
+
+Файл называется по SHA-256 своего содержимого и раскладывается по
+подкаталогам: posts/ab/cd/abcd...ef.jpg. Повторная загрузка той же
+картинки не создаёт новый файл и новые миниатюры: посты ссылаются на
+один и тот же. Счётчик ссылок — сами строки Post (поле image
+проиндексировано), поэтому release() удаляет файл и его миниатюры,
+только когда на него не ссылается ни один пост.
+
+Пост, который повторно использовал файл, может быть ещё не записан,
+когда фоновая задача проверяет ссылки. Поэтому повторная загрузка
+обновляет время изменения файла, а release() не трогает файлы, которые
+использовались последние POSTS_IMAGE_RELEASE_DELAY секунд.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+CHUNK_SIZE = 64 * 1024
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def hashed_name(self, name, content):
+        digest = content_hash(content)
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(
+            posixpath.dirname(name), digest[:2], digest[2:4],
+            digest + extension
+        )
+
+    def get_available_name(self, name, max_length=None):
+        # Одно имя — одно содержимое: существующий файл не мешает.
+        return name
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            os.utime(self.path(name))
+            return name
+        # Одинаковые картинки могут сохраняться одновременно: каждая
+        # пишется в своё временное имя и атомарно заменяет общее. Замена
+        # файла тем же содержимым ничего не портит, а FileExistsError в
+        # FileSystemStorage._save зациклился бы на том же имени.
+        temporary = super()._save(f'{name}.{uuid.uuid4().hex}.tmp', content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
+
+
+def release(name):
+    """Удаляет файл name и его миниатюры, если на него больше не ссылается
+    ни один пост.
+
+    Файлы, сохранённые до перехода на адресацию по содержимому, не
+    трогаются: их имена уникальны, и раньше они не удалялись. False —
+    файл недавно использован повторно, проверку нужно повторить позже.
+    """
+    from .models import Post
+
+    if not HASHED_NAME.search(name or ''):
+        return True
+    if Post.objects.filter(image=name).exists():
+        return True
+    storage = Post._meta.get_field('image').storage
+    try:
+        used = os.path.getmtime(storage.path(name))
+    except FileNotFoundError:
+        used = 0
+    if time.time() - used < settings.POSTS_IMAGE_RELEASE_DELAY:
+        return False
+    default.backend.delete(ImageFile(name, storage))
+    return True
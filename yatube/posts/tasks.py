@@ -0,0 +1,34 @@
+"""Фоновые задачи постов; выполняет их manage.py run_worker."""
+from django.conf import settings
+
+from core import response_cache
+from jobs.queue import task
+
+from . import counters, storage, thumbnails
+from .cache import bump_generation, surrogate_keys
+from .models import Post
+
+
+@task(retry_delay=30)
+def generate_thumbnails(post_id):
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_id
+    ).first()
+    if post is not None and post.image:
+        thumbnails.generate_post(post)
+        # Страницы, отрендеренные до миниатюр, показывают исходный файл.
+        bump_generation()
+        response_cache.purge('index', *surrogate_keys(post))
+
+
+@task
+def release_image(name):
+    if not storage.release(name):
+        release_image.delay_by(
+            settings.POSTS_IMAGE_RELEASE_DELAY, name=name
+        )
+
+
+@task(max_attempts=1, timeout=60 * 60)
+def recount(batch_size=counters.BATCH_SIZE):
+    counters.recount(batch_size)
@@ -0,0 +1,65 @@
+from django import template
+
+from ..thumbnails import (
+    FORMATS, FRAME_HEIGHT, FRAME_WIDTH, MIME_TYPES, WIDTHS, geometry,
+    ready_thumbnails
+)
+
+register = template.Library()
+
+
+def _srcset(thumbnails):
+    return ', '.join(f'{im.url} {width}w' for width, im in thumbnails)
+
+
+def _page_thumbnails(context, page):
+    # Один поиск на все картинки страницы за рендеринг шаблона.
+    key = ('post_picture', id(page))
+    if key not in context.render_context:
+        context.render_context[key] = ready_thumbnails(
+            post.image for post in page
+        )
+    return context.render_context[key]
+
+
+@register.inclusion_tag('includes/post_picture.html', takes_context=True)
+def post_picture(context, image, css_class='card-img my-2', lazy=True,
+                 page=None):
+    """<picture> с вариантами картинки поста по форматам и ширинам.
+
+    В srcset попадают только уже созданные миниатюры; пока нет ни одной
+    JPEG, <img> показывает исходный файл в той же рамке. page — страница
+    постов, миниатюры всех её картинок ищутся разом.
+    """
+    picture = {
+        'image': image,
+        'css_class': css_class,
+        'lazy': lazy,
+        'width': FRAME_WIDTH,
+        'height': FRAME_HEIGHT,
+        'sizes': f'(max-width: {FRAME_WIDTH}px) 100vw, {FRAME_WIDTH}px',
+    }
+    if not image:
+        return picture
+    ready = _page_thumbnails(context, page) if page is not None else {}
+    if (image.name, geometry(WIDTHS[0]), FORMATS[0]) not in ready:
+        ready = ready_thumbnails([image])
+    sources = []
+    for image_format in FORMATS:
+        thumbnails = []
+        for width in WIDTHS:
+            im = ready[(image.name, geometry(width), image_format)]
+            if im is not None:
+                thumbnails.append((width, im))
+        if thumbnails:
+            sources.append({
+                'format': image_format,
+                'type': MIME_TYPES[image_format],
+                'srcset': _srcset(thumbnails),
+                'src': thumbnails[-1][1].url,
+            })
+    fallback = None
+    if sources and sources[-1]['format'] == 'JPEG':
+        fallback = sources.pop()
+    picture.update(sources=sources, fallback=fallback)
+    return picture
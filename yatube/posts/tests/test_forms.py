@@ -1,11 +1,19 @@
 from django.test import Client, TestCase, override_settings
 from django.contrib.auth import get_user_model
 from ..models import Post, Group
+from jobs import queue
+from .. import storage
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
+import hashlib
+import os
 import tempfile
 import shutil
+from io import BytesIO
+from unittest import mock
 from django.conf import settings
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
 
 User = get_user_model()
 
@@ -64,8 +72,11 @@ class PostFormTest(TestCase):
             'posts:profile', kwargs={'username': self.user})
         )
         latest_post = Post.objects.all()[1]
+        digest = hashlib.sha256(small_gif).hexdigest()
         self.assertEqual(latest_post.text, NEW_POST_TEXT)
-        self.assertEqual(latest_post.image, 'posts/small.gif')
+        self.assertEqual(
+            latest_post.image, f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif'
+        )
 
     def test_post_edit(self):
         form_data = {
@@ -96,3 +107,116 @@ class PostFormTest(TestCase):
             'posts:post_detail', kwargs={'post_id': self.post.pk})
         )
         self.assertEqual(comment.text, COMMENT_TEXT)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostImageUploadTest(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='user')
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def upload(self, name, content, client=None):
+        return (client or self.author_client).post(
+            reverse('posts:post_create'),
+            {
+                'text': NEW_POST_TEXT,
+                'image': SimpleUploadedFile(name, content, 'image/jpeg'),
+            }
+        )
+
+    def jpeg(self, size, orientation=None):
+        buffer = BytesIO()
+        exif = Image.Exif()
+        if orientation:
+            exif[0x0112] = orientation
+        Image.new('RGB', size, 'red').save(
+            buffer, 'JPEG', exif=exif.tobytes()
+        )
+        return buffer.getvalue()
+
+    @override_settings(POSTS_IMAGE_MAX_SIZE=1024)
+    def test_oversized_file_is_rejected(self):
+        response = self.upload('big.jpg', self.jpeg((4, 2)) + b'0' * 2048)
+        self.assertFormError(
+            response, 'form', 'image',
+            f'Размер файла больше {filesizeformat(1024)}.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POSTS_IMAGE_MAX_PIXELS=100)
+    def test_pixel_bomb_is_rejected_by_header(self):
+        response = self.upload('bomb.jpg', self.jpeg((20, 10)))
+        self.assertFormError(
+            response, 'form', 'image',
+            'Слишком большое разрешение изображения.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    def test_exif_is_stripped_and_orientation_applied(self):
+        self.upload('rotated.jpg', self.jpeg((4, 2), orientation=6))
+        post = Post.objects.get()
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (2, 4))
+            self.assertFalse(image.getexif())
+
+    @override_settings(CSRF_FAILURE_VIEW='django.views.csrf.csrf_failure')
+    def test_upload_requires_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = self.upload('small.jpg', self.jpeg((4, 2)), client)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Post.objects.exists())
+
+    def test_same_image_is_stored_once(self):
+        content = self.jpeg((4, 2))
+        self.upload('first.jpg', content)
+        self.upload('second.JPG', content)
+        first, second = Post.objects.order_by('pk')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            os.listdir(os.path.dirname(first.image.path)),
+            [os.path.basename(first.image.name)]
+        )
+
+    def test_concurrent_saves_of_same_image(self):
+        images = Post._meta.get_field('image').storage
+        content = SimpleUploadedFile('a.jpg', self.jpeg((4, 2)))
+        # Обе загрузки не видят файл друг друга, как при гонке.
+        with mock.patch.object(images, 'exists', return_value=False):
+            first = images.save('posts/a.jpg', content)
+            second = images.save('posts/b.jpg', content)
+        self.assertEqual(first, second)
+        self.assertEqual(
+            os.listdir(os.path.dirname(images.path(first))),
+            [os.path.basename(first)]
+        )
+
+    def test_recently_reused_image_is_kept(self):
+        content = self.jpeg((4, 2))
+        self.upload('first.jpg', content)
+        post = Post.objects.get(text=NEW_POST_TEXT)
+        path = post.image.path
+        post.delete()
+        with override_settings(POSTS_IMAGE_RELEASE_DELAY=60):
+            self.assertFalse(storage.release(post.image.name))
+        self.assertTrue(os.path.exists(path))
+
+    @override_settings(POSTS_IMAGE_RELEASE_DELAY=0)
+    def test_image_is_deleted_with_last_post(self):
+        content = self.jpeg((4, 2))
+        self.upload('first.jpg', content)
+        self.upload('second.jpg', content)
+        first, second = Post.objects.order_by('pk')
+        path = first.image.path
+        first.delete()
+        queue.run_pending()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        queue.run_pending()
+        self.assertFalse(os.path.exists(path))
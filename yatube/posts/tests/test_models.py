@@ -1,7 +1,17 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
 
-from ..models import Group, Post
+from users.models import Profile
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+from ..seeding import EPOCH
 
 User = get_user_model()
 
@@ -32,3 +42,231 @@ class PostModelTest(TestCase):
         for object, expected_value in cycle_params.items():
             with self.subTest(object=object):
                 self.assertEqual(str(object), expected_value)
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        self.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Тестовое описание',
+        )
+
+    def counts(self):
+        self.author.profile.refresh_from_db()
+        self.reader.profile.refresh_from_db()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        return (
+            self.author.profile.posts_count,
+            self.author.profile.followers_count,
+            self.reader.profile.following_count,
+            self.group.posts_count,
+            self.other_group.posts_count,
+        )
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(
+            author=self.author, text='Текст', group=self.group
+        )
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.counts(), (1, 1, 1, 1, 0))
+        post.group = self.other_group
+        post.save()
+        self.assertEqual(self.counts(), (1, 1, 1, 0, 1))
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        follow.delete()
+        post.delete()
+        self.assertEqual(self.counts(), (0, 0, 0, 0, 0))
+
+    def test_recount_repairs_drift(self):
+        post = Post.objects.create(
+            author=self.author, text='Текст', group=self.group
+        )
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Profile.objects.update(
+            posts_count=7, followers_count=7, following_count=7
+        )
+        Post.objects.update(comments_count=7)
+        Group.objects.update(posts_count=7)
+        call_command('recount', batch_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.counts(), (1, 1, 1, 1, 0))
+
+
+class ImportCommandTest(TestCase):
+    records = [
+        {'type': 'group', 'slug': 'cats', 'title': 'Кошки'},
+        {'type': 'user', 'username': 'author', 'first_name': 'Автор'},
+        {'type': 'post', 'id': 10, 'author': 'author', 'group': 'cats',
+         'text': 'Первый пост', 'pub_date': '2020-01-02T03:04:05+00:00'},
+        {'type': 'post', 'id': 11, 'author': 'newcomer',
+         'text': 'Второй пост'},
+        {'type': 'comment', 'id': 20, 'post': 10, 'author': 'reader',
+         'text': 'Комментарий'},
+        {'type': 'follow', 'user': 'reader', 'author': 'author'},
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write('\n'.join(lines) + '\n')
+        return path
+
+    def jsonl(self, records):
+        return self.write(
+            'data.jsonl', [json.dumps(record) for record in records]
+        )
+
+    def test_import_jsonl(self):
+        path = self.jsonl(self.records)
+        call_command('import_yatube', path, batch_size=2, stdout=StringIO())
+        post = Post.objects.get(pk=10)
+        self.assertEqual(post.author.username, 'author')
+        self.assertEqual(post.group.slug, 'cats')
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Post.objects.get(pk=11).author.username, 'newcomer')
+        self.assertEqual(Comment.objects.get(pk=20).author.username, 'reader')
+        self.assertTrue(Follow.objects.filter(
+            user__username='reader', author__username='author'
+        ).exists())
+        self.assertEqual(
+            Profile.objects.get(user__username='author').posts_count, 1
+        )
+        self.assertEqual(Group.objects.get(slug='cats').posts_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user__username='reader', post_id=10
+        ).exists())
+        self.assertFalse(os.path.exists(path + '.checkpoint'))
+
+    def test_import_is_idempotent(self):
+        path = self.jsonl(self.records)
+        call_command('import_yatube', path, stdout=StringIO())
+        call_command('import_yatube', path, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_import_reports_inserted_rows(self):
+        path = self.jsonl(self.records)
+        out = StringIO()
+        call_command('import_yatube', path, stdout=out)
+        self.assertIn('post: 2', out.getvalue())
+        self.assertIn('comment: 1', out.getvalue())
+        out = StringIO()
+        call_command('import_yatube', path, stdout=out)
+        for record_type in ('group', 'user', 'post', 'comment', 'follow'):
+            self.assertIn(f'{record_type}: 0', out.getvalue())
+
+    def test_import_refuses_colliding_ids(self):
+        other = User.objects.create_user(username='other')
+        post = Post.objects.create(pk=10, author=other, text='Старый пост')
+        path = self.jsonl(self.records)
+        with self.assertRaisesMessage(CommandError, 'Посты с id 10'):
+            call_command('import_yatube', path, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Старый пост')
+        self.assertFalse(Comment.objects.exists())
+
+    def test_import_resumes_from_checkpoint(self):
+        path = self.jsonl(self.records[:4])
+        with open(path + '.checkpoint', 'w') as checkpoint:
+            json.dump(
+                {'size': os.path.getsize(path), 'position': 3}, checkpoint
+            )
+        call_command('import_yatube', path, stdout=StringIO())
+        self.assertFalse(Post.objects.filter(pk=10).exists())
+        self.assertTrue(Post.objects.filter(pk=11).exists())
+
+    def test_invalid_records_are_skipped(self):
+        path = self.write('data.jsonl', [
+            '{"type": "post", "id": 1, "author": "author"}',
+            'не JSON',
+            '{"type": "post", "id": "x", "author": "a", "text": "Текст"}',
+            '{"type": "post", "id": 2, "author": "author", "text": "Текст"}',
+        ])
+        errors = StringIO()
+        call_command(
+            'import_yatube', path, stdout=StringIO(), stderr=errors
+        )
+        self.assertEqual(list(Post.objects.values_list('pk', flat=True)), [2])
+        self.assertEqual(len(errors.getvalue().splitlines()), 3)
+
+    def test_import_csv(self):
+        path = self.write('posts.csv', [
+            'id,author,text,pub_date',
+            '5,author,Пост из CSV,2021-05-06 07:08:09',
+        ])
+        call_command(
+            'import_yatube', path, type='post', stdout=StringIO()
+        )
+        post = Post.objects.get(pk=5)
+        self.assertEqual(post.text, 'Пост из CSV')
+        self.assertEqual(post.pub_date.year, 2021)
+
+
+class SeedScaleCommandTest(TestCase):
+    options = {
+        'users': 50, 'groups': 3, 'posts': 300, 'comments': 200,
+        'follows': 4, 'seed': 7, 'stdout': StringIO(),
+    }
+
+    def snapshot(self):
+        return list(Post.objects.order_by('pk').values_list(
+            'pk', 'author__username', 'group__slug', 'text', 'pub_date'
+        ))
+
+    def test_seed_is_deterministic(self):
+        call_command('seed_scale', **self.options)
+        first = self.snapshot()
+        self.assertEqual(len(first), 300)
+        self.assertLess(first[-1][4], EPOCH)
+        self.assertEqual(Comment.objects.count(), 200)
+        Post.objects.all().delete()
+        get_user_model().objects.filter(
+            username__startswith='seed7_'
+        ).delete()
+        call_command('seed_scale', **self.options)
+        self.assertEqual(self.snapshot(), first)
+
+    def test_authors_follow_power_law(self):
+        call_command('seed_scale', **self.options)
+        counts = sorted(
+            Profile.objects.values_list('posts_count', flat=True),
+            reverse=True
+        )
+        self.assertEqual(sum(counts), 300)
+        self.assertGreater(counts[0], 10 * counts[len(counts) // 2])
+        self.assertTrue(Follow.objects.exists())
+        self.assertEqual(
+            TimelineEntry.objects.count(),
+            sum(
+                Post.objects.filter(author_id=author_id).count()
+                for author_id in Follow.objects.values_list(
+                    'author_id', flat=True
+                )
+            )
+        )
@@ -1,13 +1,34 @@
+import base64
+import csv
+import gzip
+import io
+import json
+import os
 import shutil
 import tempfile
+from io import StringIO
+from unittest import mock
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase, override_settings
+from django.contrib.sessions.models import Session
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
 from django.urls import reverse
 from django import forms
 from django.core.files.uploadedfile import SimpleUploadedFile
-from ..models import Post, Group, Comment, Follow
+from ..models import Post, Group, Comment, Follow, TimelineEntry
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from core.query_budget import QueryBudget, QueryBudgetExceeded
+from core.test_runner import commit_callbacks
+from sorl.thumbnail import default as thumbnail_default
+from posts import loadtest, tasks, thumbnails
+from jobs import queue
+from jobs.models import Job
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 POST_CNT = 13
@@ -152,14 +173,17 @@ class PostPagesTests(TestCase):
                 self.assertIsInstance(form_field, expected)
 
     def test_cache_index_page(self):
+        """Лента кэшируется и сбрасывается при изменении постов."""
         response = self.authorized_client.get(reverse('posts:index'))
         old_content = response.content
-        self.post_1.delete()
+        Post.objects.filter(pk=self.post_1.pk).update(text='Без сигналов')
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(old_content, response.content)
-        cache.clear()
+        with commit_callbacks():
+            self.post_1.delete()
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(response.content, old_content)
+        self.assertNotContains(response, self.post_1.text)
 
     def test_authorized_user_can_follow_and_unfollow(self):
         author = self.user_2
@@ -184,6 +208,35 @@ class PostPagesTests(TestCase):
             user=self.user_1
         ).exists())
 
+    def test_repeated_follow_and_unfollow(self):
+        url = reverse('posts:profile_follow', args=[self.user_2.username])
+        self.authorized_client.get(url)
+        self.authorized_client.get(url)
+        self.assertEqual(Follow.objects.filter(user=self.user_1).count(), 1)
+        self.assertEqual(
+            User.objects.get(pk=self.user_2.pk).profile.followers_count, 1
+        )
+        url = reverse('posts:profile_unfollow', args=[self.user_2.username])
+        self.authorized_client.get(url)
+        response = self.authorized_client.get(url)
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_index_audit_command(self):
+        out = StringIO()
+        sessions = Session.objects.count()
+        last_login = User.objects.get(pk=self.post_1.author_id).last_login
+        cache.set('sentinel', 1)
+        call_command('index_audit', strict=True, stdout=out)
+        self.assertIn('posts:group_posts', out.getvalue())
+        self.assertIn('api:comment_list', out.getvalue())
+        self.assertTrue(Post.objects.filter(pk=self.post_1.pk).exists())
+        self.assertEqual(Session.objects.count(), sessions)
+        self.assertEqual(
+            User.objects.get(pk=self.post_1.author_id).last_login, last_login
+        )
+        self.assertEqual(cache.get('sentinel'), 1)
+
     def test_follow_index(self):
         another_client = Client()
         another_client.force_login(self.user_2)
@@ -208,6 +261,29 @@ class PostPagesTests(TestCase):
         obj = response.context['page_obj'][0]
         self.assertNotEqual(obj, post_2)
 
+    def test_follow_index_uses_timeline(self):
+        """Лента подписок собирается из TimelineEntry и отсортирована."""
+        Follow.objects.create(author=self.user_2, user=self.user_1)
+        post_2 = Post.objects.create(author=self.user_2, text='Второй')
+        post_3 = Post.objects.create(author=self.user_2, text='Третий')
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user_1).count(), 2
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [post_3, post_2]
+        )
+        Follow.objects.filter(author=self.user_2, user=self.user_1).delete()
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user_1))
+
+    def test_rebuild_timeline_command(self):
+        Follow.objects.create(author=self.user_1, user=self.user_2)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timeline', stdout=StringIO())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user_2, post=self.post_1
+        ).exists())
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -223,6 +299,10 @@ class PaginatorViewsTest(TestCase):
         ]
         Post.objects.bulk_create(objs)
 
+    def setUp(self):
+        # bulk_create не шлёт сигналов, сбрасывающих кэш страниц.
+        cache.clear()
+
     def test_first_page_contains_ten_records(self):
         response = self.client.get(reverse('posts:index'))
         self.assertEqual(len(response.context['page_obj']), 10)
@@ -231,8 +311,506 @@ class PaginatorViewsTest(TestCase):
         response = self.client.get(reverse('posts:index') + '?page=2')
         self.assertEqual(len(response.context['page_obj']), 3)
 
+    def test_cached_pages_differ(self):
+        """Кэш ленты учитывает номер страницы."""
+        first = self.client.get(reverse('posts:index'))
+        second = self.client.get(reverse('posts:index') + '?page=2')
+        self.assertNotContains(first, 'Тестовый текст0<')
+        self.assertContains(second, 'Тестовый текст0<')
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class QueryBudgetViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        for e in range(POST_CNT):
+            author = User.objects.create_user(username=f'author{e}')
+            group = Group.objects.create(
+                title=f'Группа {e}',
+                slug=f'group_{e}',
+                description='Тестовое описание',
+            )
+            cls.post = Post.objects.create(
+                author=author, group=group, text=f'Тестовый текст{e}'
+            )
+            Comment.objects.create(
+                post=cls.post, author=author, text='Комментарий'
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text='Комментарий'
+            )
+            Follow.objects.create(user=cls.reader, author=author)
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_views_fit_query_budget(self):
+        """Число запросов страниц не зависит от числа постов."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': 'group_0'}),
+            reverse('posts:profile', kwargs={'username': 'author0'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            for client in (self.client, self.reader_client):
+                with self.subTest(url=url):
+                    cache.clear()
+                    client.get(url)
+
+    def test_views_with_images_fit_query_budget(self):
+        """Миниатюры всех картинок страницы ищутся одним запросом."""
+        Post.objects.update(image='posts/small.gif')
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': 'group_0'}),
+            reverse('posts:profile', kwargs={'username': 'author0'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:search') + '?q=Тестовый',
+        )
+        for url in urls:
+            for client in (self.client, self.reader_client):
+                with self.subTest(url=url):
+                    cache.clear()
+                    with CaptureQueriesContext(connection) as queries:
+                        response = client.get(url)
+                    self.assertContains(response, 'small.gif')
+                    kvstore = [
+                        query for query in queries.captured_queries
+                        if 'thumbnail_kvstore' in query['sql']
+                    ]
+                    self.assertEqual(len(kvstore), 1)
+        cache.clear()
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'small.gif')
+
+    def test_anonymous_page_cache(self):
+        """Анонимам страница отдаётся из кэша до изменения поста."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertIn(f'post:{self.post.pk}', response['Surrogate-Key'])
+        other_url = reverse('posts:group_posts', kwargs={'slug': 'group_0'})
+        self.client.get(other_url)
+        with commit_callbacks():
+            Comment.objects.create(
+                post=self.post, author=self.reader, text='Новый комментарий'
+            )
+            # До фиксации транзакции кэш не сбрасывается.
+            self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'Новый комментарий')
+        self.assertEqual(self.client.get(other_url)['X-Cache'], 'HIT')
+        self.assertNotIn('X-Cache', self.reader_client.get(url))
+
+    def test_conditional_get(self):
+        """Повторный запрос с ETag получает 304, пока пост не изменён."""
+        urls = (
+            reverse('posts:group_posts', kwargs={'slug': 'group_0'}),
+            reverse('posts:profile', kwargs={'username': 'author0'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        etags = {}
+        for url in urls:
+            for client in (self.client, self.reader_client):
+                with self.subTest(url=url):
+                    etags[url] = client.get(url)['ETag']
+                    response = client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+                    self.assertEqual(response.status_code, 304)
+        post = Post.objects.get(group__slug='group_0')
+        post.text = 'Изменённый текст'
+        post.save()
+        for url in urls[:2]:
+            with self.subTest(url=url):
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url]
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_conditional_get_after_renaming(self):
+        """Новое имя автора или название группы меняет ETag страниц."""
+        author = self.post.author
+        group = self.post.group
+        urls = (
+            reverse('posts:group_posts', kwargs={'slug': group.slug}),
+            reverse('posts:profile', kwargs={'username': author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        for rename in ('author', 'group'):
+            etags = {
+                url: self.reader_client.get(url)['ETag'] for url in urls
+            }
+            with commit_callbacks():
+                if rename == 'author':
+                    author.first_name = 'Переименованный'
+                    author.save()
+                else:
+                    group.title = 'Переименованная группа'
+                    group.save()
+            changed = urls if rename == 'author' else urls[::2]
+            for url in changed:
+                with self.subTest(rename=rename, url=url):
+                    response = self.reader_client.get(
+                        url, HTTP_IF_NONE_MATCH=etags[url]
+                    )
+                    self.assertEqual(response.status_code, 200)
+
+    def test_conditional_get_after_deleting_newest_post(self):
+        """Удаление самого нового поста меняет ETag группы, автора и ленты."""
+        author = User.objects.get(username='author0')
+        group = Group.objects.get(slug='group_0')
+        urls = (
+            reverse('posts:group_posts', kwargs={'slug': 'group_0'}),
+            reverse('posts:profile', kwargs={'username': 'author0'}),
+            reverse('posts:index_rss'),
+        )
+        newest = Post.objects.create(
+            author=author, group=group, text='Самый новый'
+        )
+        etags = {}
+        for url in urls:
+            response = self.reader_client.get(url)
+            self.assertNotIn('Last-Modified', response)
+            etags[url] = response['ETag']
+        with commit_callbacks():
+            newest.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url]
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertNotContains(response, 'Самый новый')
+
+    def test_query_budget_exceeded(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with QueryBudget(1):
+                list(Post.objects.all())
+                list(Group.objects.all())
+
+
+class SearchViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user', is_staff=True,
+                                            is_superuser=True)
+        cls.post = Post.objects.create(
+            author=cls.user, text='Красивые фотографии котов'
+        )
+        cls.other_post = Post.objects.create(
+            author=cls.user, text='Заметки о погоде'
+        )
+        Comment.objects.create(
+            post=cls.other_post, author=cls.user, text='Дождливый вторник'
+        )
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_finds_word_forms(self):
+        """Поиск учитывает словоформы и комментарии."""
+        self.assertEqual(self.search('красивый кот'), [self.post])
+        self.assertEqual(self.search('ФОТОГРАФИЯ'), [self.post])
+        self.assertEqual(self.search('дождливые'), [self.other_post])
+        self.assertEqual(self.search('собаки'), [])
+        self.assertEqual(self.search(''), [])
+
+    def test_search_index_follows_changes(self):
+        self.post.text = 'Собаки'
+        self.post.save()
+        self.assertEqual(self.search('котов'), [])
+        self.assertEqual(self.search('собака'), [self.post])
+        self.other_post.delete()
+        self.assertEqual(self.search('вторник'), [])
+
+    def test_rebuild_search_index_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM posts_search')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('погода'), [self.other_post])
+
+    def test_admin_search_uses_index(self):
+        admin_client = Client()
+        admin_client.force_login(self.user)
+        response = admin_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'кот'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.post]
+        )
+
+
+@override_settings(POSTS_CURSOR_PAGINATION=True)
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create([
+            Post(author=cls.user, group=cls.group, text=f'Текст{e}')
+            for e in range(POST_CNT)
+        ])
+        cls.follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=cls.follower, author=cls.user)
+
+    def test_cursor_pages(self):
+        """Страницы ленты переключаются курсорами newer/older."""
+        follower_client = Client()
+        follower_client.force_login(self.follower)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'user'}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first = follower_client.get(url).context['page_obj']
+                self.assertEqual(len(first), 10)
+                self.assertFalse(first.has_previous())
+                second = follower_client.get(
+                    url, {'cursor': first.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second), 3)
+                self.assertFalse(second.has_next())
+                back = follower_client.get(
+                    url, {'cursor': second.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back), list(first))
+
+    def test_invalid_cursor_shows_first_page(self):
+        response = self.client.get(reverse('posts:index'), {'cursor': '!!'})
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_cursor_with_invalid_values_shows_first_page(self):
+        follower_client = Client()
+        follower_client.force_login(self.follower)
+        values = (
+            ['garbage', 1],
+            ['2020-01-01T00:00:00', 'x'],
+            [[1], {}],
+            [None, 1],
+        )
+        for url in (reverse('posts:index'), reverse('posts:follow_index')):
+            for value in values:
+                with self.subTest(url=url, value=value):
+                    payload = json.dumps(['next', value]).encode()
+                    cursor = base64.urlsafe_b64encode(payload).decode()
+                    response = follower_client.get(url, {'cursor': cursor})
+                    self.assertEqual(response.status_code, 200)
+                    page = response.context['page_obj']
+                    self.assertEqual(len(page), 10)
+                    self.assertFalse(page.has_previous())
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POSTS_THUMBNAIL_ROOT=os.path.join(TEMP_MEDIA_ROOT, 'thumbnails')
+)
+class FeedViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Первая строка\nвторая', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds(self):
+        feeds = {
+            reverse('posts:index_rss'): 'application/rss+xml',
+            reverse('posts:index_atom'): 'application/atom+xml',
+            reverse('posts:group_rss', args=['group']):
+                'application/rss+xml',
+            reverse('posts:group_atom', args=['group']):
+                'application/atom+xml',
+            reverse('posts:profile_rss', args=['author']):
+                'application/rss+xml',
+            reverse('posts:profile_atom', args=['author']):
+                'application/atom+xml',
+        }
+        for url, content_type in feeds.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(
+                    response['Content-Type'].startswith(content_type)
+                )
+                self.assertContains(response, 'Первая строка')
+                self.assertContains(
+                    response,
+                    reverse('posts:post_detail', args=[self.post.pk])
+                )
+        response = self.client.get(reverse('posts:group_rss', args=['none']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_feed_is_cached_until_posts_change(self):
+        url = reverse('posts:group_atom', args=['group'])
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(response.status_code, 304)
+        with commit_callbacks():
+            Post.objects.create(
+                author=self.author, text='Новый пост', group=self.group
+            )
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'Новый пост')
+
+    def test_pages_link_to_feeds(self):
+        response = self.client.get(reverse('posts:profile', args=['author']))
+        self.assertContains(
+            response, reverse('posts:profile_rss', args=['author'])
+        )
+
+
+class BenchmarkViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        post = Post.objects.create(author=author, text='Пост', group=group)
+        Comment.objects.create(post=post, author=reader, text='Комментарий')
+        Follow.objects.create(user=reader, author=author)
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.baseline = os.path.join(directory, 'views.json')
+
+    def benchmark(self, **options):
+        call_command(
+            'benchmark_views', current_db=True, requests=3, warmup=1,
+            baseline=self.baseline, stdout=StringIO(), **options
+        )
+
+    def test_benchmark_against_baseline(self):
+        sessions = Session.objects.count()
+        cache.set('sentinel', 1)
+        self.benchmark(save_baseline=True)
+        self.assertEqual(Session.objects.count(), sessions)
+        self.assertEqual(cache.get('sentinel'), 1)
+        with open(self.baseline, encoding='utf-8') as source:
+            baseline = json.load(source)
+        self.assertEqual(set(baseline), {
+            'index', 'group_posts', 'profile', 'post_detail',
+            'follow_index', 'post_create',
+        })
+        self.assertEqual(baseline['index']['queries'], 4)
+        self.assertEqual(Post.objects.count(), 1)
+        self.benchmark(threshold=100)
+        baseline['profile']['queries'] -= 1
+        with open(self.baseline, 'w', encoding='utf-8') as output:
+            json.dump(baseline, output)
+        with self.assertRaisesMessage(CommandError, 'profile: запросов'):
+            self.benchmark(threshold=100)
+
+
+class ExportViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {number}', group=cls.group
+            )
+            for number in range(3)
+        ]
+        Post.objects.create(
+            author=User.objects.create_user(username='other'),
+            text='Чужой пост'
+        )
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def export(self, client, **params):
+        return client.get(
+            reverse('posts:profile_export', args=[self.author.username]),
+            params
+        )
+
+    def test_export_jsonl(self):
+        response = self.export(self.author_client)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('author-posts.jsonl.gz',
+                      response['Content-Disposition'])
+        content = gzip.decompress(b''.join(response.streaming_content))
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [record['id'] for record in records],
+            [post.pk for post in self.posts]
+        )
+        self.assertEqual(records[0]['type'], 'post')
+        self.assertEqual(records[0]['author'], 'author')
+        self.assertEqual(records[0]['group'], 'group')
+        self.assertEqual(records[0]['text'], 'Пост 0')
+
+    def test_export_csv(self):
+        response = self.export(self.author_client, format='csv')
+        content = gzip.decompress(b''.join(response.streaming_content))
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual(len(rows), len(self.posts))
+        self.assertEqual(rows[-1]['text'], 'Пост 2')
+
+    def test_export_is_private(self):
+        other_client = Client()
+        other_client.force_login(User.objects.get(username='other'))
+        self.assertEqual(self.export(other_client).status_code, 403)
+        self.assertEqual(self.export(self.client).status_code, 302)
+
+    def test_export_command_output_can_be_imported(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'posts.jsonl.gz')
+            call_command(
+                'export_posts', 'author', output=path, gzip=True,
+                stderr=StringIO()
+            )
+            Post.objects.filter(author=self.author).delete()
+            call_command('import_yatube', path, stdout=StringIO())
+        self.assertEqual(
+            list(Post.objects.filter(author=self.author).order_by('pk')
+                 .values_list('pk', 'text')),
+            [(post.pk, post.text) for post in self.posts]
+        )
+
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class ImageVeiwsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -295,3 +873,116 @@ class ImageVeiwsTest(TestCase):
         )
         object = response.context['post']
         self.assertEqual(object.image, self.post.image)
+
+    def test_thumbnail_is_not_generated_on_render(self):
+        cache.clear()
+        with mock.patch.object(
+            thumbnail_default.backend, 'generate'
+        ) as generate:
+            response = self.authorized_client.get(reverse('posts:index'))
+        generate.assert_not_called()
+        self.assertContains(response, self.post.image.url)
+        self.assertContains(response, 'width="960" height="339"')
+
+    def test_generated_thumbnails_are_rendered(self):
+        cache.clear()
+        call_command('generate_thumbnails', stdout=StringIO())
+        generated = [
+            thumbnail_default.backend.get_ready_thumbnail(
+                self.post.image, geometry_string, **options
+            )
+            for geometry_string, options in thumbnails.SIZES
+        ]
+        response = self.authorized_client.get(reverse('posts:index'))
+        for width, im in zip(thumbnails.WIDTHS, generated):
+            self.assertContains(response, f'{im.url} {width}w')
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertNotContains(response, self.post.image.url)
+
+    def test_pages_are_refreshed_after_thumbnails(self):
+        cache.clear()
+        url = reverse('posts:index')
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertContains(response, self.post.image.url)
+        self.assertContains(
+            self.authorized_client.get(url), self.post.image.url
+        )
+        tasks.generate_thumbnails(post_id=self.post.pk)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertNotContains(response, self.post.image.url)
+        response = self.authorized_client.get(url)
+        self.assertNotContains(response, self.post.image.url)
+
+    def test_post_create_queues_thumbnails(self):
+        uploaded = SimpleUploadedFile(
+            name='new.gif',
+            content=self.small_gif,
+            content_type='image/gif'
+        )
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'text': 'с картинкой', 'image': uploaded}
+        )
+        post = Post.objects.get(text='с картинкой')
+        job = Job.objects.get(name='posts.tasks.generate_thumbnails')
+        self.assertEqual(json.loads(job.payload), {'post_id': post.pk})
+        queue.run_pending()
+        for geometry_string, options in thumbnails.SIZES:
+            self.assertIsNotNone(
+                thumbnail_default.backend.get_ready_thumbnail(
+                    post.image, geometry_string, **options
+                )
+            )
+
+
+class LoadtestCommandTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username='author')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.create(author=author, text='Пост', group=group)
+
+    def test_histogram(self):
+        histogram = loadtest.Histogram()
+        for milliseconds in (1, 7, 7, 30, 9000):
+            histogram.add(milliseconds)
+        self.assertEqual(histogram.counts, [1, 2, 0, 1, 0, 0, 0, 0, 0, 0, 1])
+        self.assertEqual(histogram.percentile(0.5), 7)
+
+    def test_parse_mix(self):
+        self.assertEqual(
+            loadtest.parse_mix('browse=3,feed=1'),
+            {'browse': 3.0, 'feed': 1.0}
+        )
+        for value in ('browse=x', 'unknown=1', 'browse=0'):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    loadtest.parse_mix(value)
+
+    def test_anonymous_browsing(self):
+        with loadtest.serve() as (base_url, counter):
+            stats, elapsed = loadtest.run(base_url, duration=0.5, threads=2)
+        self.assertEqual(set(stats.requests), {'browse'})
+        self.assertGreater(stats.requests['browse'], 0)
+        self.assertEqual(sum(stats.errors.values()), 0)
+
+    def test_command_runs_all_scenarios(self):
+        out = StringIO()
+        call_command(
+            'loadtest', duration=1, threads=1,
+            mix='feed=1,comment=1,follow=1', stdout=out
+        )
+        output = out.getvalue()
+        self.assertIn('Ошибок блокировки SQLite', output)
+        self.assertIn('Гистограмма задержек', output)
+        self.assertTrue(
+            User.objects.filter(username='loadtest_0').exists()
+        )
+        for scenario in ('feed', 'comment', 'follow'):
+            self.assertIn(scenario, output)
+        self.assertNotIn('login', output)
@@ -0,0 +1,187 @@
+"""Фоновая генерация миниатюр картинок постов.
+
+Картинка поста отдаётся набором вариантов: ширины WIDTHS в форматах
+FORMATS (AVIF и WebP, если их умеет сохранять установленный Pillow,
+и JPEG для остальных браузеров). Все варианты из SIZES создаёт
+фоновая задача posts.tasks.generate_thumbnails, которая ставится
+в очередь при сохранении поста.
+
+DeferredThumbnailBackend подключается через THUMBNAIL_BACKEND, поэтому
+ни тег {% post_picture %}, ни {% thumbnail %} не декодируют и не
+масштабируют картинку при рендеринге: страница обходится готовыми
+вариантами или исходным изображением. Миниатюры постов, загруженных
+раньше, создаёт команда generate_thumbnails. Готовые варианты всех
+картинок страницы ищет ready_thumbnails() одним обращением к кэшу
+key-value store и одним запросом к его таблице.
+"""
+import os
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+# Рамка картинки в ленте; меньшие ширины сохраняют её пропорции.
+FRAME_WIDTH, FRAME_HEIGHT = 960, 339
+WIDTHS = (480, 720, 960)
+OPTIONS = {'crop': 'center', 'upscale': True}
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+
+
+def _can_save(image_format):
+    Image.init()
+    return image_format in Image.SAVE
+
+
+# От самого компактного к самому совместимому; JPEG есть всегда.
+FORMATS = tuple(
+    image_format for image_format in ('AVIF', 'WEBP')
+    if _can_save(image_format)
+) + ('JPEG',)
+
+
+def geometry(width):
+    return f'{width}x{round(width * FRAME_HEIGHT / FRAME_WIDTH)}'
+
+
+# Все варианты, которые используют шаблоны: (геометрия, опции).
+SIZES = tuple(
+    (geometry(width), {**OPTIONS, 'format': image_format})
+    for image_format in FORMATS
+    for width in WIDTHS
+)
+
+
+class ThumbnailStorage(FileSystemStorage):
+    """Отдельный каталог миниатюр (POSTS_THUMBNAIL_ROOT).
+
+    Их пишут фоновые воркеры, поэтому они не смешиваются с загрузками
+    в MEDIA_ROOT и не мешают его очистке или переносу.
+    """
+
+    @property
+    def base_location(self):
+        return settings.POSTS_THUMBNAIL_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+    @property
+    def base_url(self):
+        return settings.POSTS_THUMBNAIL_URL
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, который не создаёт миниатюры синхронно."""
+
+    def _prepare_options(self, source, options):
+        """Те же опции по умолчанию, что в ThumbnailBackend.get_thumbnail.
+
+        От них зависит имя файла миниатюры, поэтому они должны совпадать
+        при поиске в key-value store и при генерации.
+        """
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return options
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        if options['format'] in EXTENSIONS:
+            return super()._get_thumbnail_filename(
+                source, geometry_string, options
+            )
+        key = tokey(source.key, geometry_string, serialize(options))
+        return '%s%s/%s/%s.%s' % (
+            sorl_settings.THUMBNAIL_PREFIX, key[:2], key[2:4], key,
+            options['format'].lower()
+        )
+
+    def _thumbnail_file(self, file_, geometry_string, options):
+        source = ImageFile(file_)
+        prepared = self._prepare_options(source, dict(options))
+        name = self._get_thumbnail_filename(source, geometry_string, prepared)
+        return ImageFile(name, default.storage)
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        """Миниатюра из key-value store или None, если её ещё нет."""
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        thumbnail = self._thumbnail_file(file_, geometry_string, options)
+        return default.kvstore.get(thumbnail) or None
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        return (
+            self.get_ready_thumbnail(file_, geometry_string, **options)
+            or ImageFile(file_)
+        )
+
+    def generate(self, file_, geometry_string, **options):
+        """Создаёт миниатюру синхронно, как исходный бэкенд sorl."""
+        return super().get_thumbnail(file_, geometry_string, **options)
+
+
+def ready_thumbnails(files):
+    """Готовые варианты SIZES картинок files.
+
+    {(имя картинки, геометрия, формат): ImageFile или None}. Вместо
+    обращения к key-value store на каждый вариант каждой картинки ключи
+    ищутся одним get_many в его кэше, а промахи — одним запросом к
+    таблице; не найденные в ней тоже кэшируются, как это делает sorl.
+    """
+    backend, kvstore = default.backend, default.kvstore
+    files = [file_ for file_ in files if file_]
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return {
+            (file_.name, geometry_string, options['format']):
+                backend.get_ready_thumbnail(file_, geometry_string, **options)
+            for file_ in files
+            for geometry_string, options in SIZES
+        }
+    variants = {
+        add_prefix(backend._thumbnail_file(
+            file_, geometry_string, options
+        ).key): (file_.name, geometry_string, options['format'])
+        for file_ in files
+        for geometry_string, options in SIZES
+    }
+    empty = cached_db_kvstore.EMPTY_VALUE
+    values = kvstore.cache.get_many(variants)
+    missing = [key for key in variants if key not in values]
+    if missing:
+        found = dict(KVStoreModel.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        found = {key: found.get(key, empty) for key in missing}
+        kvstore.cache.set_many(found, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(found)
+    return {
+        variant: (
+            None if values[key] == empty
+            else deserialize_image_file(values[key])
+        )
+        for key, variant in variants.items()
+    }
+
+
+def generate_post(post):
+    """Синхронно создаёт все варианты картинки поста."""
+    for geometry_string, options in SIZES:
+        default.backend.generate(post.image, geometry_string, **options)
@@ -0,0 +1,70 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Каждый новый пост раскладывается в ленты подписчиков автора, поэтому
+страница /follow/ читает одну таблицу по индексу (user, -pub_date)
+вместо обхода постов всех авторов, на которых подписан пользователь.
+"""
+from django.db import connection
+
+from .models import Follow, Post, TimelineEntry
+
+BATCH_SIZE = 500
+
+
+def _bulk_insert(entries):
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fan_out(post):
+    """Добавляет пост в ленты всех подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту user все уже опубликованные посты author."""
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('id', 'pub_date')
+    entries = []
+    for post_id, pub_date in posts.iterator(chunk_size=BATCH_SIZE):
+        entries.append(
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        )
+        if len(entries) >= BATCH_SIZE:
+            _bulk_insert(entries)
+            entries = []
+    _bulk_insert(entries)
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты user посты автора, от которого он отписался."""
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id
+    ).delete()
+
+
+def rebuild():
+    """Пересобирает все ленты по текущим подпискам.
+
+    Один INSERT ... SELECT вместо backfill() на каждую подписку: на
+    миллионах записей лент разница — часы против минут.
+    """
+    TimelineEntry.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TimelineEntry._meta.db_table} '
+            f'(user_id, post_id, pub_date) '
+            f'SELECT follow.user_id, post.id, post.pub_date '
+            f'FROM {Follow._meta.db_table} AS follow '
+            f'INNER JOIN {Post._meta.db_table} AS post '
+            f'ON post.author_id = follow.author_id'
+        )
@@ -0,0 +1,137 @@
+"""Потоковая загрузка картинок постов.
+
+PostImageUploadHandler пишет файл на диск кусками, не держа его
+в памяти, и отбраковывает его, как только становится ясно, что он
+больше POSTS_IMAGE_MAX_SIZE байт или, судя по одному заголовку, больше
+POSTS_IMAGE_MAX_PIXELS пикселей. Отбракованный файл не удаляется из
+запроса, а получает upload_error: его показывает PostForm. Принятая
+картинка за один проход поворачивается по EXIF Orientation и
+пересохраняется без EXIF.
+"""
+import io
+import warnings
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Сколько начальных байт файла можно держать, пока не найден заголовок.
+HEADER_LIMIT = 1024 * 1024
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'WEBP': {'quality': 90},
+}
+
+
+def _read_size(header):
+    """(ширина, высота) из начала файла или None, если данных мало.
+
+    Image.open разбирает только заголовок и не выделяет память под
+    пиксели. DecompressionBombError пробрасывается.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            with Image.open(io.BytesIO(header)) as image:
+                return image.size
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError):
+        return None
+
+
+class PostImageUploadHandler(TemporaryFileUploadHandler):
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.header = b''
+        self.size = None
+        self.error = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error:
+            return None
+        self.received += len(raw_data)
+        if self.received > settings.POSTS_IMAGE_MAX_SIZE:
+            limit = filesizeformat(settings.POSTS_IMAGE_MAX_SIZE)
+            return self._reject(f'Размер файла больше {limit}.')
+        if self.size is None:
+            self._check_header(raw_data)
+            if self.error:
+                return None
+        self.file.write(raw_data)
+        return None
+
+    def _check_header(self, raw_data):
+        self.header += raw_data
+        try:
+            self.size = _read_size(self.header)
+        except Image.DecompressionBombError:
+            return self._reject('Слишком большое разрешение изображения.')
+        if self.size is not None:
+            self.header = b''
+            width, height = self.size
+            if width * height > settings.POSTS_IMAGE_MAX_PIXELS:
+                self._reject('Слишком большое разрешение изображения.')
+        elif len(self.header) > HEADER_LIMIT:
+            self._reject('Не удалось распознать изображение.')
+
+    def _reject(self, message):
+        self.error = message
+        self.header = b''
+        self.file.truncate(0)
+
+    def file_complete(self, file_size):
+        if self.error:
+            self.file.seek(0)
+            self.file.size = 0
+            self.file.upload_error = self.error
+            return self.file
+        upload = super().file_complete(file_size)
+        try:
+            return self._normalize(upload)
+        except (OSError, SyntaxError, ValueError,
+                Image.DecompressionBombError):
+            # Битый файл отбракует проверка ImageField.
+            upload.seek(0)
+            return upload
+
+    def _normalize(self, upload):
+        """Поворот по EXIF и удаление EXIF; файл без EXIF не меняется."""
+        with Image.open(upload.temporary_file_path()) as image:
+            if getattr(image, 'is_animated', False) or not image.getexif():
+                upload.seek(0)
+                return upload
+            image_format = image.format
+            normalized = ImageOps.exif_transpose(image)
+        normalized.info.pop('exif', None)
+        result = TemporaryUploadedFile(
+            upload.name, upload.content_type, 0, upload.charset,
+            upload.content_type_extra
+        )
+        normalized.save(
+            result, format=image_format, **SAVE_OPTIONS.get(image_format, {})
+        )
+        result.size = result.tell()
+        result.seek(0)
+        upload.close()
+        return result
+
+
+def post_image_uploads(view_func):
+    """Принимает файлы запроса через PostImageUploadHandler.
+
+    Обработчики загрузки можно заменить только до чтения request.POST,
+    а CsrfViewMiddleware читает его раньше представления, поэтому
+    проверка CSRF переносится внутрь декоратора.
+    """
+    protected = csrf_protect(view_func)
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [PostImageUploadHandler(request)]
+        return protected(request, *args, **kwargs)
+    return csrf_exempt(wrapper)
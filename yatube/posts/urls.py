@@ -1,13 +1,37 @@
 from django.urls import path
-from . import views
+from . import feeds, views
 
 app_name = "posts"
 
 urlpatterns = [
     path("", views.index, name="index"),
+    path("feed/", feeds.index_rss, name="index_rss"),
+    path("feed/atom/", feeds.index_atom, name="index_atom"),
     path("profile/<str:username>/", views.profile, name="profile"),
+    path(
+        "profile/<str:username>/export/",
+        views.profile_export,
+        name="profile_export"
+    ),
+    path(
+        "profile/<str:username>/feed/",
+        feeds.profile_rss,
+        name="profile_rss"
+    ),
+    path(
+        "profile/<str:username>/feed/atom/",
+        feeds.profile_atom,
+        name="profile_atom"
+    ),
     path("posts/<int:post_id>/", views.post_detail, name="post_detail"),
     path("group/<slug:slug>/", views.group_posts, name="group_posts"),
+    path("group/<slug:slug>/feed/", feeds.group_rss, name="group_rss"),
+    path(
+        "group/<slug:slug>/feed/atom/",
+        feeds.group_atom,
+        name="group_atom"
+    ),
+    path("search/", views.search, name="search"),
     path("create/", views.post_create, name="post_create"),
     path("posts/<post_id>/edit/", views.post_edit, name="post_edit"),
     path("posts/<post_id>/delete", views.post_delete, name="post_delete"),
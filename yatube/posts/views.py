@@ -1,55 +1,102 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import StreamingHttpResponse
 from django.shortcuts import redirect, render, get_object_or_404
+from . import export
 from .forms import PostForm, CommentForm
+from .cache import cache_context, surrogate_keys
+from .conditions import (
+    conditional_group, conditional_post, conditional_profile
+)
 from .models import Post, Group, Follow
+from .search import search_posts
+from .tasks import generate_thumbnails
+from .uploads import post_image_uploads
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.contrib.auth import get_user_model
+from core.db_router import use_replica
+from core.paginator import CursorPaginator
+from core.response_cache import add_surrogate_keys, cache_anonymous
+from core.query_budget import query_budget
+from core.sqlite import retry_on_lock
 
 User = get_user_model()
 POST_CNT = 10
 
 
+def paginate(request, posts, ordering=("-pub_date", "-id")):
+    """Страница постов: курсорная при POSTS_CURSOR_PAGINATION."""
+    if settings.POSTS_CURSOR_PAGINATION:
+        paginator = CursorPaginator(posts, POST_CNT, ordering)
+        return paginator.get_page(request.GET.get("cursor"))
+    paginator = Paginator(posts, POST_CNT)
+    return paginator.get_page(request.GET.get("page"))
+
+
+@query_budget(5)
+@use_replica
+@cache_anonymous
 def index(request):
     template = "posts/index.html"
     title = "Yatube"
-    posts = Post.objects.all().order_by("-pub_date")
-    paginator = Paginator(posts, POST_CNT)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.select_related("author", "group").order_by(
+        "-pub_date", "-id"
+    )
+    page_obj = paginate(request, posts)
     context = {
         "title": title,
         "text": "Последние обновления на сайте",
         "posts": posts,
         "page_obj": page_obj,
-        "index": True
+        "index": True,
+        **cache_context(),
     }
-    return render(request, template, context)
+    response = render(request, template, context)
+    return add_surrogate_keys(response, "index")
 
 
+@query_budget(7)
+@use_replica
+@cache_anonymous
+@conditional_group
 def group_posts(request, slug):
     template = "posts/group_list.html"
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all().order_by("-pub_date")
+    posts = group.posts.select_related("author", "group").order_by(
+        "-pub_date", "-id"
+    )
     descripction = group.description
-    paginator = Paginator(posts, POST_CNT)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, posts)
     context = {
         "group": group,
         "descripction": descripction,
         "posts": posts,
         "text": f"Записи сообщества {group}",
         "page_obj": page_obj,
+        **cache_context(),
     }
-    return render(request, template, context)
+    response = render(request, template, context)
+    return add_surrogate_keys(response, f"group:{group.slug}")
 
 
+@query_budget(8)
+@use_replica
+@cache_anonymous
+@conditional_profile
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all().order_by("-pub_date")
-    paginator = Paginator(posts, POST_CNT)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related("profile"),
+        username=username
+    )
+    posts = author.posts.select_related("group").order_by(
+        "-pub_date", "-id"
+    )
+    page_obj = paginate(request, posts)
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user,
         author=author
@@ -58,15 +105,46 @@ def profile(request, username):
         "author": author,
         "posts": posts,
         "page_obj": page_obj,
-        "following": following
+        "following": following,
+        **cache_context(),
     }
-    return render(request, "posts/profile.html", context)
+    response = render(request, "posts/profile.html", context)
+    return add_surrogate_keys(response, f"author:{author.username}")
 
 
+@login_required
+def profile_export(request, username):
+    """Все посты автора одним сжатым файлом JSONL или CSV (?format=csv).
+
+    Выгрузка доступна самому автору и персоналу.
+    """
+    author = get_object_or_404(User, username=username)
+    if request.user != author and not request.user.is_staff:
+        raise PermissionDenied
+    file_format = request.GET.get("format", "jsonl")
+    if file_format not in export.FORMATS:
+        file_format = "jsonl"
+    response = StreamingHttpResponse(
+        export.stream(author, file_format),
+        content_type="application/gzip"
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{export.filename(author, file_format)}"'
+    )
+    return response
+
+
+@query_budget(6)
+@use_replica
+@cache_anonymous
+@conditional_post
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related("author__profile", "group"),
+        id=post_id
+    )
     group = post.group
-    comments = post.comments.all()
+    comments = post.comments.select_related("author")
     comment_form = CommentForm(request.POST or None)
     context = {
         "post": post,
@@ -74,10 +152,26 @@ def post_detail(request, post_id):
         'comments': comments,
         'form': comment_form
     }
-    return render(request, "posts/post_detail.html", context)
+    response = render(request, "posts/post_detail.html", context)
+    return add_surrogate_keys(response, *surrogate_keys(post))
+
+
+@query_budget(6)
+def search(request):
+    query = request.GET.get("q", "").strip()
+    paginator = Paginator(search_posts(query), POST_CNT)
+    page_obj = paginator.get_page(request.GET.get("page"))
+    context = {
+        "query": query,
+        "page_obj": page_obj,
+        "page_params": urlencode({"q": query}) + "&",
+    }
+    return render(request, "posts/search.html", context)
 
 
 @login_required
+@post_image_uploads
+@retry_on_lock
 def post_create(request):
     author = get_object_or_404(User, username=request.user)
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -85,12 +179,16 @@ def post_create(request):
         deform = form.save(commit=False)
         deform.author = author
         deform.save()
+        if deform.image:
+            generate_thumbnails.delay(post_id=deform.pk)
         return redirect("posts:profile", username=author)
     context = {"form": form}
     return render(request, "posts/post_create.html", context)
 
 
 @login_required
+@post_image_uploads
+@retry_on_lock
 def post_edit(request, post_id):
     author = get_object_or_404(User, username=request.user)
     post = get_object_or_404(Post, id=post_id)
@@ -105,12 +203,15 @@ def post_edit(request, post_id):
         deform = form.save(commit=False)
         deform.author = author
         deform.save()
+        if deform.image:
+            generate_thumbnails.delay(post_id=deform.pk)
         return redirect("posts:post_detail", post_id=post_id)
     context = {"form": form, "is_edit": True}
     return render(request, "posts/post_create.html", context)
 
 
 @login_required
+@retry_on_lock
 def post_delete(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     if request.user == post.author:
@@ -120,6 +221,7 @@ def post_delete(request, post_id):
 
 
 @login_required
+@retry_on_lock
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -131,16 +233,16 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(5)
 @login_required
+@use_replica
 def follow_index(request):
-    user = request.user
-    user_following = Follow.objects.filter(user=user)
-    posts = []
-    for follow in user_following:
-        posts += follow.author.posts.all()
-    paginator = Paginator(posts, POST_CNT)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.select_related("author", "group").filter(
+        timeline_entries__user=request.user
+    ).annotate(
+        timeline_date=F("timeline_entries__pub_date")
+    ).order_by("-timeline_date", "-id")
+    page_obj = paginate(request, posts, ("-timeline_date", "-id"))
     context = {
         'page_obj': page_obj,
         'follow': True
@@ -149,21 +251,24 @@ def follow_index(request):
 
 
 @login_required
+@retry_on_lock
 def profile_follow(request, username):
     user = request.user
     author = User.objects.get(username=username)
-    if author != user and not Follow.objects.filter(
-        user=user,
-        author=author
-    ).exists():
-        Follow.objects.create(user=user, author=author)
+    if author != user:
+        try:
+            with transaction.atomic():
+                Follow.objects.create(user=user, author=author)
+        except IntegrityError:
+            # Уже подписан: пару (user, author) защищает posts_follow_unique.
+            pass
     return redirect('posts:profile', username=author)
 
 
 @login_required
+@retry_on_lock
 def profile_unfollow(request, username):
     user = request.user
     author = User.objects.get(username=username)
-    follow_object = Follow.objects.get(user=user, author=author)
-    follow_object.delete()
+    Follow.objects.filter(user=user, author=author).delete()
     return redirect('posts:profile', username=author)
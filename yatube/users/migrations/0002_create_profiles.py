@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def create_profiles(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Profile = apps.get_model('users', 'Profile')
+    users = User.objects.filter(profile__isnull=True).values_list(
+        'id', flat=True
+    )
+    Profile.objects.bulk_create(
+        (Profile(user_id=user_id) for user_id in users.iterator()),
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_profile'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_profiles, migrations.RunPython.noop),
+    ]
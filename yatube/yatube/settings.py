@@ -46,19 +46,25 @@ INSTALLED_APPS = [
     "users.apps.UsersConfig",
     "core.apps.CoreConfig",
     "about.apps.AboutConfig",
+    "jobs.apps.JobsConfig",
+    "api.apps.ApiConfig",
     'sorl.thumbnail',
     'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    "core.middleware.TimingMiddleware",
+    "core.middleware.QueryTagMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "core.middleware.ReplicaMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    'debug_toolbar.middleware.DebugToolbarMiddleware'
+    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    "core.middleware.QueryBudgetMiddleware",
 ]
 
 ROOT_URLCONF = "yatube.urls"
@@ -66,7 +72,7 @@ ROOT_URLCONF = "yatube.urls"
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "core.metrics.TimedTemplates",
         "DIRS": [TEMPLATES_DIR],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -83,6 +89,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "yatube.wsgi.application"
 
+# Тесты пишут метрики и журнал медленных запросов во временный каталог.
+TEST_RUNNER = "core.test_runner.TestRunner"
+
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
@@ -91,6 +100,7 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+        "CONN_MAX_AGE": 60,
     }
 }
 
@@ -146,12 +156,93 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кэш общий для всех процессов (воркеры сервера, команды, обработчик
+# задач): иначе версии ключей, которые сбрасывают кэши при изменениях,
+# видит только процесс, который их увеличил.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_DIR', os.path.join(BASE_DIR, 'var', 'cache')
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
     }
 }
 
 INTERNAL_IPS = [
     '127.0.0.1',
-] 
\ No newline at end of file
+]
+# Курсорная (keyset) пагинация лент вместо постраничной с COUNT/OFFSET.
+POSTS_CURSOR_PAGINATION = False
+
+# Время жизни фрагментов лент; актуальность обеспечивает posts.cache.
+POSTS_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Превышение бюджета SQL-запросов (@query_budget): исключение вместо
+# предупреждения в логе. Включается в тестах представлений.
+QUERY_BUDGET_RAISE = False
+
+# Кэш страниц для анонимов (core.response_cache), сбрасывается сигналами.
+ANONYMOUS_CACHE_TIMEOUT = 60 * 60
+
+# Миниатюры создаются в фоне (posts.thumbnails), а не при рендеринге.
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+THUMBNAIL_STORAGE = 'posts.thumbnails.ThumbnailStorage'
+POSTS_THUMBNAIL_ROOT = os.path.join(BASE_DIR, 'thumbnails')
+POSTS_THUMBNAIL_URL = '/thumbnails/'
+
+# Ограничения загружаемых картинок постов (posts.uploads).
+POSTS_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+POSTS_IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+
+# Через сколько секунд после удаления поста проверяется, нужен ли ещё его
+# файл картинки (posts.storage.release): за это время успевают записаться
+# посты, которые загрузили ту же картинку.
+POSTS_IMAGE_RELEASE_DELAY = 10 * 60
+
+# Очередь фоновых задач (jobs): сколько секунд задача невидима для других
+# воркеров после того, как её забрали, и потоков в run_worker по умолчанию.
+JOBS_VISIBILITY_TIMEOUT = 5 * 60
+JOBS_WORKER_THREADS = 2
+
+# Прагмы, которые core.sqlite выполняет на каждом новом соединении SQLite,
+# и повторы транзакций, упавших с «database is locked» (retry_on_lock).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+SQLITE_LOCK_RETRIES = 5
+SQLITE_LOCK_RETRY_DELAY = 0.05
+
+# Реплики только для чтения (core.db_router): алиасы из DATABASES, с которых
+# читают представления с @use_replica, и сколько секунд после записи
+# пользователь читает с основной базы.
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_STICKY_SECONDS = 10
+
+# Эталон manage.py benchmark_views: с ним сравниваются новые замеры.
+BENCHMARK_BASELINE = os.path.join(BASE_DIR, 'benchmarks', 'views.json')
+
+# Замеры запросов (core.metrics): каталог, куда каждый процесс сбрасывает
+# свои гистограммы не чаще раза в METRICS_FLUSH_INTERVAL секунд, адреса,
+# которым открыт /metrics, и отправка заголовка Server-Timing. За обратным
+# прокси REMOTE_ADDR у всех запросов — адрес прокси: закройте /metrics
+# на самом прокси. Server-Timing раскрывает число и время SQL-запросов,
+# поэтому по умолчанию отправляется только при DEBUG.
+METRICS_DIR = os.environ.get(
+    'YATUBE_METRICS_DIR', os.path.join(BASE_DIR, 'var', 'metrics')
+)
+METRICS_FLUSH_INTERVAL = 1.0
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+METRICS_SERVER_TIMING = DEBUG
+
+# Журнал медленных запросов (core.querylog): запросы дольше SLOW_QUERY_MS
+# миллисекунд пишутся с планом в SLOW_QUERY_LOG, сводка —
+# manage.py slow_queries.
+SLOW_QUERY_MS = 100
+SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'var', 'slow_queries.jsonl')